@@ -0,0 +1,54 @@
+"""
+Persistent PDF text-extraction cache.
+Entries are keyed by the file's content hash plus the extractor version and
+store the per-page text gzip-compressed next to data/pdfs/metadata.json, so
+unchanged PDFs are never re-extracted (and the sparse and dense builders
+share one extraction).
+"""
+import os
+import gzip
+import json
+import hashlib
+import fitz  # PyMuPDF
+
+CACHE_DIR = "data/pdfs/extract_cache"
+# Bump the suffix when extraction logic changes; PyMuPDF upgrades invalidate too
+EXTRACTOR_VERSION = f"pymupdf-{fitz.VersionBind}-pages-v1"
+
+# SHA-256 of a file's bytes, read in 1 MB blocks
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _entry_path(digest):
+    key = hashlib.sha256(f"{digest}:{EXTRACTOR_VERSION}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json.gz")
+
+def has(digest):
+    return os.path.exists(_entry_path(digest))
+
+# Cached page texts for a content hash, or None on a miss
+def get(digest):
+    path = _entry_path(digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+    except Exception:
+        return None  # corrupt/partial entry: treat as a miss
+    if entry.get("sha256") != digest or entry.get("extractor") != EXTRACTOR_VERSION:
+        return None
+    return entry["pages"]
+
+# Store page texts atomically (write temp file, then rename)
+def put(digest, pages):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _entry_path(digest)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump({"sha256": digest, "extractor": EXTRACTOR_VERSION, "pages": pages}, f)
+    os.replace(tmp_path, path)
@@ -1,5 +1,5 @@
 import os
-from .load_pdfs import load_pdfs              # Loads PDFs from disk
+from .load_pdfs import load_pdfs, iter_pdfs   # Loads PDFs from disk
 from .future_scripts_impl.scrape_nasa import get_nasa_data        # Scrapes/loads NASA data
 from .future_scripts_impl.load_wikipedia import get_wikipedia_data  # Fetches Wikipedia content
 
@@ -27,6 +27,16 @@ def load_nasa_data():
     print("Loading NASA scraped content...")
     return get_nasa_data()
 
+# Streaming aggregator: yields (text, metadata) per document from every source,
+# so builders can process one document at a time instead of the whole corpus
+def iter_all_data():
+    print("Streaming PDFs...")
+    yield from iter_pdfs(PDF_DIR)
+
+    if INCLUDE_NASA_DATA:  # conditionally add NASA
+        docs, meta = load_nasa_data()
+        yield from zip(docs, meta)
+
 # Aggregator: load all sources and combine their outputs
 def load_all_data():
     """
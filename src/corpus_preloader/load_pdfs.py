@@ -1,13 +1,24 @@
 import os
 import json
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF: used to open and extract text from PDFs
 
 # Call to download PDFs beforehand (ensures required files are present)
 from .static_download_pdfs import download_selected_pdfs
+from . import extract_cache  # content-hash cache of extracted page texts
 
 # Path to saved metadata that describes each PDF file (manual or pre-created)
 METADATA_FILE = "data/pdfs/metadata.json"
 
+USE_EXTRACT_CACHE = True
+
+# Parallel extraction: each PDF is split into page ranges extracted concurrently
+PARALLEL_EXTRACTION = True
+PAGES_PER_TASK = 16                 # pages per worker task
+MAX_WORKERS = os.cpu_count() or 1   # extraction processes (and PDFs in flight)
+
 # Load the metadata JSON file if it exists
 def load_saved_metadata():
     if os.path.exists(METADATA_FILE):
@@ -29,31 +40,124 @@ def find_metadata_for_file(filename, metadata_list):
         "filename": filename
     }
 
-# Main loader function to extract text and metadata from all PDFs in the given path
-def load_pdfs(path):
-    download_selected_pdfs()  # Make sure PDFs are downloaded before processing
+# Worker: extract the text of pages [start, stop) of one PDF
+def extract_page_range(file_path, start, stop):
+    with fitz.open(file_path) as doc:  # Open PDF using PyMuPDF
+        return [doc[i].get_text() for i in range(start, stop)]
 
-    texts = []     # Raw text of each PDF
-    metadata = []  # Metadata for each PDF
-    saved_metadata = load_saved_metadata()
+def count_pages(file_path):
+    with fitz.open(file_path) as doc:
+        return doc.page_count
 
-    for file in os.listdir(path):
-        if file.endswith(".pdf"):  # Only process PDF files
-            file_path = os.path.join(path, file)
+# Yield (file_path, list of page texts | exception) in file order.
+# Parallel mode keeps up to MAX_WORKERS PDFs in flight, each split into page
+# ranges, so all cores stay busy while memory stays bounded.
+def iter_extracted_pages(file_paths, parallel=PARALLEL_EXTRACTION):
+    if not parallel:
+        for file_path in file_paths:
             try:
-                with fitz.open(file_path) as doc:  # Open PDF using PyMuPDF
-                    text = ""
-                    for page in doc:
-                        text += page.get_text()  # Extract text page by page
+                yield file_path, extract_page_range(file_path, 0, count_pages(file_path))
+            except Exception as e:
+                yield file_path, e
+        return
 
-                    texts.append(text)  # Save entire document text
+    # Spawned, not forked: builds run this from a prefetch thread, and forking
+    # while other threads hold locks can deadlock the workers
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")) as pool:
+        def submit(file_path):
+            try:
+                n_pages = count_pages(file_path)
+            except Exception as e:
+                return file_path, e
+            return file_path, [pool.submit(extract_page_range, file_path, start, min(start + PAGES_PER_TASK, n_pages))
+                               for start in range(0, n_pages, PAGES_PER_TASK)]
 
-                    meta = find_metadata_for_file(file, saved_metadata)
-                    meta["filepath"] = file_path  # Store file location in metadata
-                    metadata.append(meta)
+        files = iter(file_paths)
+        in_flight = deque(submit(f) for _, f in zip(range(MAX_WORKERS), files))
 
+        while in_flight:
+            file_path, futures = in_flight.popleft()
+            next_file = next(files, None)
+            if next_file is not None:
+                in_flight.append(submit(next_file))
+
+            if isinstance(futures, Exception):
+                yield file_path, futures
+                continue
+            try:
+                yield file_path, [page for f in futures for page in f.result()]
             except Exception as e:
-                print(f"❌ Failed to load {file}: {e}")
+                yield file_path, e
+
+# Like iter_extracted_pages, but unchanged PDFs (same content hash + extractor
+# version) are served from the extraction cache; only misses are extracted
+def iter_cached_pages(file_paths, parallel=PARALLEL_EXTRACTION):
+    digests = {}
+    for file_path in file_paths:
+        try:
+            digests[file_path] = extract_cache.file_hash(file_path)
+        except OSError:
+            digests[file_path] = None
+
+    misses = [f for f in file_paths if digests[f] is None or not extract_cache.has(digests[f])]
+    print(f"🗃️ Extraction cache: {len(file_paths) - len(misses)} hit(s), {len(misses)} to extract")
+    extracted = iter_extracted_pages(misses, parallel)
+    miss_set = set(misses)
+
+    for file_path in file_paths:
+        digest = digests[file_path]
+        pages = None if file_path in miss_set else extract_cache.get(digest)
+
+        if pages is None:
+            if file_path in miss_set:
+                _, pages = next(extracted)
+            else:  # unreadable cache entry: extract this one inline
+                _, pages = next(iter_extracted_pages([file_path], parallel=False))
+            if digest is not None and not isinstance(pages, Exception):
+                extract_cache.put(digest, pages)
+
+        yield file_path, pages
+
+# Streaming loader: yields (text, metadata) one PDF at a time, in filename order.
+# Pages are joined once; metadata records the page count and the character
+# offset where each page starts in the text.
+def iter_pdfs(path, parallel=PARALLEL_EXTRACTION):
+    download_selected_pdfs()  # Make sure PDFs are downloaded before processing
+
+    files = sorted(f for f in os.listdir(path) if f.endswith(".pdf"))  # Only process PDF files
+    yield from iter_pdf_files([os.path.join(path, f) for f in files], parallel)
+
+# Same, for an explicit list of PDF paths (e.g. newly added files)
+def iter_pdf_files(file_paths, parallel=PARALLEL_EXTRACTION):
+    saved_metadata = load_saved_metadata()
+
+    extract = iter_cached_pages if USE_EXTRACT_CACHE else iter_extracted_pages
+    for file_path, pages in extract(list(file_paths), parallel):
+        file = os.path.basename(file_path)
+        if isinstance(pages, Exception):
+            print(f"❌ Failed to load {file}: {pages}")
+            continue
+
+        page_offsets, offset = [], 0
+        for page in pages:
+            page_offsets.append(offset)
+            offset += len(page)
+
+        meta = find_metadata_for_file(file, saved_metadata)
+        meta["filepath"] = file_path  # Store file location in metadata
+        meta["page_count"] = len(pages)
+        meta["page_offsets"] = page_offsets  # char offset of each page (page i+1 starts at [i])
+
+        yield "".join(pages), meta
+
+# Main loader function to extract text and metadata from all PDFs in the given path
+def load_pdfs(path):
+    texts = []     # Raw text of each PDF
+    metadata = []  # Metadata for each PDF
+
+    for text, meta in iter_pdfs(path):
+        texts.append(text)  # Save entire document text
+        metadata.append(meta)
 
     return texts, metadata  # Return list of doc texts and matching metadata
 
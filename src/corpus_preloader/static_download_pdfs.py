@@ -63,6 +63,7 @@ def download_pdf(pdf_url):
 def download_selected_pdfs():
     metadata = load_metadata()
     already_downloaded = {entry["url"] for entry in metadata}
+    n_known = len(metadata)
 
     for url in tqdm(HARDCODED_PDF_URLS, desc="Downloading PDFs"):
         if url in already_downloaded:
@@ -81,7 +82,9 @@ def download_selected_pdfs():
             "source": "manual"
         })
 
-    save_metadata(metadata)
+    # Rewritten only when it changed: index build manifests fingerprint it
+    if len(metadata) > n_known or not os.path.exists(METADATA_FILE):
+        save_metadata(metadata)
     print(f"\n✅ Done. Total PDFs: {len(metadata)}")
 
 if __name__ == "__main__":
@@ -1,55 +1,230 @@
 import os
-import json
+import queue
+import argparse
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from corpus_preloader.load_all_data import load_all_data
-from dense.dense_corpus_loader.preprocess import preprocess
+from corpus_preloader.load_all_data import iter_all_data, INCLUDE_NASA_DATA
+from corpus_preloader.extract_cache import EXTRACTOR_VERSION
+# Chunking is shared with the BM25 index (see preprocess.py); incremental updates use it too
+from dense.dense_corpus_loader.preprocess import (iter_chunks, CHUNKER_VERSION, CHUNK_TOKENS, CHUNK_OVERLAP,
+                                                  CHUNK_STRATEGY)
+from dense.dense_corpus_loader.pipeline import prefetch, batched, JsonArrayWriter
+from dense import faiss_index
+from dense.embedding import get_model, model_id
+from dense.embedding_cache import EmbeddingCache
+from metadata_store import MetadataStoreWriter
+from text_store import TextStoreWriter
+import index_manifest
 
 INDEX_DIR = "index"
+INDEX_FILE = "dense_index.faiss"
+MANIFEST = "dense"           # index/dense_manifest.json: what the index was built from (see index_manifest.py)
+METADATA_DIR = "dense_meta"  # columnar chunk metadata (see metadata_store.py)
+TEXT_DIR = "dense_text"      # memory-mapped chunk texts (see text_store.py)
+RAW_TEXT_DIR = "raw_text"    # extracted document texts, written by this build only
+TEXT_COMPRESSION = None      # "zstd" compresses the text stores per block (needs zstandard)
 os.makedirs(INDEX_DIR, exist_ok=True)
 
-def save_json(obj, filename):
-    with open(os.path.join(INDEX_DIR, filename), "w") as f:
-        json.dump(obj, f, indent=2)
+# FAISS index type: "flat" (exact), "hnsw", "ivf_flat", "ivf_pq" or "binary" (see dense/faiss_index.py)
+INDEX_TYPE = "flat"
+STORAGE = "fp32"  # vector codes: "fp32", "fp16" or "sq8"
+PCA_DIM = None    # e.g. 128 to project embeddings before indexing
 
-def build():
-    index_path = os.path.join(INDEX_DIR, "dense_index.faiss")
-    if os.path.exists(index_path):
+# Streaming build knobs: memory is bounded by these, not by corpus size
+EMBED_BATCH = 256   # chunks encoded + added to the index per step
+DOC_QUEUE = 2       # extracted documents buffered ahead of chunking
+CHUNK_QUEUE = 1024  # chunks buffered ahead of encoding
+
+# Content-addressed chunk-embedding cache: rebuilds only encode new chunk texts
+USE_EMBEDDING_CACHE = True
+EMBEDDING_CACHE_DTYPE = "float32"  # "float16" halves the cache on disk
+
+# Pass items through while recording them (used to stream raw docs to disk).
+# Runs in a prefetch thread, so document rows for the metadata store go
+# through `documents` and are written by the consuming thread (drain_documents)
+def tap(stream, writer, meta_writer, documents):
+    for doc, meta in stream:
+        writer.write(doc)
+        meta_writer.write(meta)
+        documents.put(meta)
+        yield doc, meta
+
+def drain_documents(documents, store):
+    while True:
+        try:
+            store.write_document(documents.get_nowait())
+        except queue.Empty:
+            return
+
+def open_embedding_cache():
+    return EmbeddingCache(model_id(), EMBEDDING_CACHE_DTYPE) if USE_EMBEDDING_CACHE else None
+
+# Encode a batch of chunk texts into normalized float32 vectors; with a cache,
+# only texts it hasn't seen go through the model (which loads on first miss)
+def embed(texts, cache=None):
+    embeddings, missing = cache.get_many(texts) if cache is not None else (None, list(range(len(texts))))
+
+    if missing:
+        fresh = get_model().encode([texts[i] for i in missing], batch_size=64)
+        fresh = np.array(fresh).astype("float32")
+        faiss.normalize_L2(fresh)
+        if cache is not None:
+            cache.put_many([texts[i] for i in missing], fresh)
+        if embeddings is None:
+            embeddings = np.zeros((len(texts), fresh.shape[1]), dtype="float32")
+        embeddings[missing] = fresh
+
+    faiss.normalize_L2(embeddings)  #Essential for cosine similarity (magnituded)
+    return embeddings
+
+# Everything that shapes the index content; a change means a rebuild
+def manifest_config():
+    return {
+        "extractor": EXTRACTOR_VERSION,
+        "include_nasa_data": INCLUDE_NASA_DATA,
+        "chunk_tokens": CHUNK_TOKENS,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "chunk_strategy": CHUNK_STRATEGY,
+        "chunker": CHUNKER_VERSION,
+        "embedding_model": model_id(),
+    }
+
+def report_cache(cache):
+    if cache is not None:
+        total = cache.stats["hits"] + cache.stats["misses"]
+        print(f"🧠 Embedding cache: {cache.stats['hits']}/{total} chunks reused "
+              f"({cache.hit_rate():.1%}), {cache.stats['misses']} encoded")
+
+class IndexBuilder:
+    """
+    Creates the FAISS index on the first embeddings. Configurations that need
+    training (IVF, SQ8, PCA) buffer the first `train_size` vectors, train on
+    that sample, then switch to streaming adds, so memory stays bounded by
+    the sample.
+    """
+
+    def __init__(self, index_type, index_params=None):
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        defaults = faiss_index.resolve_params(index_type, index_params)
+        self.train_size = defaults["train_size"]
+        self.trainable = faiss_index.needs_training(defaults)
+        self.index = None
+        self.params = None
+        self._pending = []
+        self._n_pending = 0
+
+    @property
+    def ntotal(self):
+        return (self.index.ntotal if self.index is not None else 0) + self._n_pending
+
+    # Chunk ids are assigned in arrival order: id == row in the text and
+    # metadata stores
+    def _add(self, embeddings):
+        ids = np.arange(self.index.ntotal, self.index.ntotal + len(embeddings), dtype=np.int64)
+        self.index.add_with_ids(embeddings, ids)
+
+    def add(self, embeddings):
+        if self.index is not None:
+            self._add(embeddings)
+            return
+
+        self._pending.append(embeddings)
+        self._n_pending += len(embeddings)
+        if not self.trainable or self._n_pending >= self.train_size:
+            self._create()
+
+    def _create(self):
+        vectors = np.vstack(self._pending)
+        self._pending, self._n_pending = [], 0
+        sample = vectors[:self.train_size]
+
+        self.params = faiss_index.resolve_params(self.index_type, self.index_params, n_train=len(sample))
+        self.index = faiss_index.make_index(vectors.shape[1], self.params, INDEX_DIR)
+        if not self.index.is_trained:
+            print(f"🏋️ Training {faiss_index.factory_string(self.params)} on {len(sample)} vectors...")
+            self.index.train(sample)
+        self._add(vectors)
+
+    # Flush any buffered vectors (corpus smaller than the training sample)
+    def finish(self):
+        if self.index is None and self._pending:
+            self._create()
+        return self.index, self.params
+
+def build(index_type=INDEX_TYPE, index_params=None, storage=STORAGE, pca_dim=PCA_DIM, force=False):
+    index_path = os.path.join(INDEX_DIR, INDEX_FILE)
+    if os.path.exists(index_path) and not force:
         print("✅ FAISS index already exists. Skipping build.")
         return
 
-    print("📦 Loading raw data...")
-    raw_docs, raw_meta = load_all_data()
+    # The old index stops being valid the moment its stores are overwritten
+    index_manifest.invalidate(INDEX_DIR, MANIFEST)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    sources = index_manifest.build_sources()
+    cache = open_embedding_cache()
 
-    print("🧹 Preprocessing and chunking...")
-    chunks, chunk_meta = preprocess(raw_docs, raw_meta, max_tokens=300, overlap=50)
+    print(f"📦 Streaming documents → chunks → embeddings → {index_type} ({storage}) index...")
+    builder = IndexBuilder(index_type, {"storage": storage, "pca_dim": pca_dim, **(index_params or {})})
 
-    print("🤖 Loading embedding model...")
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    with TextStoreWriter(os.path.join(INDEX_DIR, RAW_TEXT_DIR), TEXT_COMPRESSION) as raw_docs, \
+         JsonArrayWriter(os.path.join(INDEX_DIR, "raw_metadata.json")) as raw_meta, \
+         TextStoreWriter(os.path.join(INDEX_DIR, TEXT_DIR), TEXT_COMPRESSION) as corpus, \
+         MetadataStoreWriter(os.path.join(INDEX_DIR, METADATA_DIR)) as metadata:
 
-    print("🔢 Encoding chunks into embeddings...")
-    embeddings = model.encode(chunks, show_progress_bar=True)
-    embeddings = np.array(embeddings).astype("float32")
+        # Extraction and chunking run in background threads behind bounded
+        # queues; encoding below pulls from them (back-pressure when it lags)
+        documents = queue.SimpleQueue()
+        docs = prefetch(tap(iter_all_data(), raw_docs, raw_meta, documents), maxsize=DOC_QUEUE)
+        chunks = prefetch(iter_chunks(docs, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP,
+                                      strategy=CHUNK_STRATEGY), maxsize=CHUNK_QUEUE)
 
-    print("🔄 Normalizing embeddings for cosine similarity...")
-    faiss.normalize_L2(embeddings)  #Essential for cosine similarity (magnituded)
+        try:
+            for batch in batched(chunks, EMBED_BATCH):
+                embeddings = embed([text for text, _ in batch], cache)
+
+                # Inner product works as cosine similarity after normalization
+                builder.add(embeddings)
+
+                drain_documents(documents, metadata)
+                for text, chunk_meta in batch:
+                    corpus.write(text)
+                    metadata.write_chunk(chunk_meta)
+
+                print(f"🔢 Indexed {builder.ntotal} chunks from {raw_docs.count} documents...")
+        finally:
+            # On any exit (encode error, Ctrl-C) stop and join both producer
+            # threads, outermost first, so no extraction work is left running
+            chunks.close()
+            docs.close()
+        drain_documents(documents, metadata)  # documents without chunks, after the last batch
 
-    print("🧠 Building FAISS index with cosine similarity...")
-    dim = embeddings.shape[1]
-    #index = faiss.IndexFlatL2(dim) # Eucledean distance 
-    index = faiss.IndexFlatIP(dim)  # Inner product works as cosine similarity after normalization
-    index.add(embeddings)
+        index, params = builder.finish()
+        if index is None:
+            raise RuntimeError("No chunks were produced; nothing to index.")
 
-    print("💾 Saving index and metadata...")
-    faiss.write_index(index, index_path)
-    save_json(chunks, "dense_corpus.json")
-    save_json(chunk_meta, "dense_metadata.json")
-    save_json(raw_docs, "raw_corpus.json")
-    save_json(raw_meta, "raw_metadata.json")
+    print("💾 Saving index...")
+    faiss_index.save_params(INDEX_DIR, params)  # search-time knobs for retrieval
+    faiss_index.write_index(index, index_path)
+    # Written last: marks the build complete and records how to redo it
+    index_manifest.save(INDEX_DIR, MANIFEST, manifest_config(),
+                        {"index_type": index_type, "index_params": index_params,
+                         "storage": storage, "pca_dim": pca_dim}, sources)
 
-    print("✅ Dense index built and saved.")
+    report_cache(cache)
+    print(f"✅ Dense index built and saved ({index.ntotal} chunks).")
 
 if __name__ == "__main__":
-    build()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-type", default=INDEX_TYPE, choices=faiss_index.INDEX_TYPES)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=faiss_index.DEFAULT_PARAMS["nprobe"])
+    parser.add_argument("--ef-search", type=int, default=faiss_index.DEFAULT_PARAMS["ef_search"])
+    parser.add_argument("--storage", default=STORAGE, choices=faiss_index.STORAGE_TYPES)
+    parser.add_argument("--pca-dim", type=int, default=PCA_DIM)
+    parser.add_argument("--force", action="store_true", help="rebuild even if an index exists")
+    args = parser.parse_args()
 
+    build(args.index_type, {"nlist": args.nlist, "nprobe": args.nprobe, "ef_search": args.ef_search},
+          storage=args.storage, pca_dim=args.pca_dim, force=args.force)
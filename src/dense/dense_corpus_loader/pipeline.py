@@ -0,0 +1,133 @@
+"""
+Small streaming helpers for the dense index build.
+Stages are plain generators; prefetch() moves a stage into a background
+thread behind a bounded queue, so a fast producer blocks (back-pressure)
+instead of buffering the whole corpus in memory.
+"""
+import json
+import os
+import queue
+import threading
+
+_DONE = object()
+
+
+# Run `iterable` in a daemon thread, handing items over through a queue of
+# at most `maxsize` items. Exceptions in the producer are re-raised here.
+# When the consumer stops (exhausted, error, or close()), the producer is
+# signalled, closes `iterable` (releasing open files / worker pools) and is
+# joined before this generator returns.
+def prefetch(iterable, maxsize=8):
+    q = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    # Blocks while the queue is full, but gives up once the consumer has stopped
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:  # hand the error to the consumer
+            put(e)
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()  # consumer stopped early: let the producer exit
+        while not q.empty():  # free queued items (and a producer blocked on put)
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        thread.join()
+
+
+# Group an iterable into lists of `size` items (last one may be shorter)
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class JsonArrayWriter:
+    """
+    Streams items into a JSON array file one at a time.
+    Writes to `<path>.tmp` and renames on a clean close, so readers never
+    see a half-written file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.count = 0
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.tmp_path, "w")
+        self._f.write("[")
+        return self
+
+    def write(self, obj):
+        self._f.write(",\n" if self.count else "\n")
+        json.dump(obj, self._f)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.write("\n]")
+        self._f.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+        return False
+
+
+# Append items to an existing JSON array file in place: only the closing
+# bracket is rewritten, so the cost is proportional to the new items
+def append_json_array(path, items):
+    with open(path, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        tail_start = max(f.tell() - 64, 0)
+        f.seek(tail_start)
+        tail = f.read()
+
+        close = tail.rindex(b"]")
+        empty = tail_start == 0 and tail[:close].strip() == b"["
+        f.seek(tail_start + close)
+        f.truncate()
+
+        count = 0
+        for item in items:
+            f.write(b"\n" if empty and not count else b",\n")
+            f.write(json.dumps(item).encode())
+            count += 1
+        f.write(b"\n]")
+    return count
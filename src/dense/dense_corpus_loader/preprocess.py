@@ -1,18 +1,30 @@
 """
 Text cleaning + chunking that keeps accurate LLaMA token counts and
-emits rich, per-chunk metadata for citations.
+emits compact per-chunk metadata (document fields live once in the
+metadata store, see metadata_store.py).
 Supports SLIDING WINDOW strategies for both minimal duplication or
 maximum semantic coherence.
 """
 import html
 import unicodedata
 import re, itertools, tiktoken
+import numpy as np
 from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
 
 # ── Token encoder ──
 # Approximates LLaMA's tokenization for accurate token length limits
 ENCODER = tiktoken.get_encoding("cl100k_base")  # similar to LLaMA 7B tokenizer
 
+# Chunking shared by the dense and BM25 indexes: the same passage gets the same
+# (document, chunk_id) in both, which is what hybrid fusion matches on.
+# Incremental dense updates must use it too.
+CHUNK_TOKENS = 300
+CHUNK_OVERLAP = 50
+CHUNK_STRATEGY = "semantic"
+
+# Bumped whenever chunk boundaries change (recorded in the build manifests)
+CHUNKER_VERSION = 3
+
 
 def clean(text: str) -> str:
     # Decode HTML entities like &nbsp;, &#x2019;, etc.
@@ -43,35 +55,158 @@ def clean(text: str) -> str:
     return ' '.join(words).strip()
 
 
-def chunk(text: str, max_tokens=400, overlap=30, strategy="semantic"):
+# ── Token offsets ──
+# Tokenize the whole document once and count how many tokens fall in each word.
+# The separating space belongs to the word after it, so " word" tokens (and a
+# lone " " token) are credited to that word. cl100k splits text into pieces
+# before BPE and no piece spans two words, so a word's count doesn't depend
+# on its neighbours.
+def word_token_counts(text: str, words):
+    word_starts = np.zeros(len(words), dtype=np.int64)
+    np.cumsum([len(w) + 1 for w in words[:-1]], out=word_starts[1:])
+
+    tokens = ENCODER.encode_ordinary(text)
+    _, tok_starts = ENCODER.decode_with_offsets(tokens)
+
+    word_of_token = np.searchsorted(word_starts, np.asarray(tok_starts, dtype=np.int64) + 1, side="right") - 1
+    return np.bincount(word_of_token, minlength=len(words))
+
+
+# Standalone token count of a chunk text (what the embedder will see)
+def n_tokens(text: str) -> int:
+    return len(ENCODER.encode_ordinary(text))
+
+
+# Split words that encode to more than max_tokens (long URLs, base64, tables
+# glued together by extraction) on token boundaries, so every word fits in a
+# chunk. Takes the words' in-document token counts and returns the new word
+# list, its counts and, per original word, its new index (plus a final entry
+# for the end), for remapping page offsets. Only split words are re-encoded.
+def split_long_words(words, counts, max_tokens):
+    # In-context counts are within a token or two of standalone ones; only
+    # the candidates are re-encoded
+    suspects = set(np.flatnonzero(counts > max_tokens - 2).tolist())
+    if not suspects:
+        return words, counts, np.arange(len(words) + 1, dtype=np.int64)
+
+    out, out_counts, index = [], [], np.zeros(len(words) + 1, dtype=np.int64)
+    for i, word in enumerate(words):
+        index[i] = len(out)
+        if i not in suspects or n_tokens(word) <= max_tokens:
+            out.append(word)
+            out_counts.append(counts[i])
+            continue
+        tokens = ENCODER.encode_ordinary(word)
+        _, starts = ENCODER.decode_with_offsets(tokens)
+        starts = list(starts) + [len(word)]
+        a = 0
+        while a < len(tokens):
+            b = min(a + max_tokens, len(tokens))
+            # BPE is not prefix-stable: re-encoding a piece can cost more tokens
+            while b > a + 1 and (starts[b] <= starts[a] or n_tokens(word[starts[a]:starts[b]]) > max_tokens):
+                b -= 1
+            if starts[b] > starts[a]:
+                piece = word[starts[a]:starts[b]]
+                # In the document every piece but a leading one follows a space
+                out_counts.append(n_tokens(" " + piece if out else piece))
+                out.append(piece)
+            a = b
+    index[len(words)] = len(out)
+    return out, np.asarray(out_counts, dtype=np.int64), index
+
+
+def chunk_spans(words, cum, max_tokens=400, overlap=30, strategy="semantic"):
     """
-    Chunk text with a sliding window.
+    Sliding window cut directly on token offsets over a list of words.
+    cum[i] is the number of tokens before word i in the document (words
+    single-space separated, as clean() emits). Yields (start_word, end_word,
+    token_count) with end exclusive. A window encoded alone costs its words'
+    in-document counts, except that its first word loses the leading space,
+    so only that word is re-encoded; windows never exceed max_tokens (a word
+    longer than that on its own stays a one-word window; split_long_words()
+    avoids those).
 
     strategy: "semantic" -> high overlap (better coherence)
               "minimal"  -> low overlap (faster, cheaper)
     """
-    words = text.split()
-    ptr = 0
-
     # Adjust overlap based on strategy
     if strategy == "minimal":
         overlap = 0
-    elif strategy == "semantic":
-        overlap = overlap
-    else:
+    elif strategy != "semantic":
         raise ValueError("Invalid strategy. Choose 'semantic' or 'minimal'.")
 
+    if not words:
+        return
+
+    ptr = 0
     while ptr < len(words):
-        chunk_words = words[ptr:ptr + max_tokens]
+        # Standalone tokens of the first word (the document's first has no space)
+        first = n_tokens(words[ptr]) if ptr else int(cum[1])
+
+        # Longest window of whole words that stays within max_tokens
+        end = int(np.searchsorted(cum, cum[ptr + 1] - first + max_tokens, side="right")) - 1
+        end = min(max(end, ptr + 1), len(words))
+        count = first + int(cum[end] - cum[ptr + 1])
+
+        yield ptr, end, count
+
+        if end == len(words):
+            break
+
+        # Next window starts `overlap` tokens before this one ended, unless
+        # the next word wouldn't fit next to that overlap (re-emitting tails)
+        ptr = max(int(np.searchsorted(cum, cum[end] - overlap, side="left")), ptr + 1)
+        if cum[end + 1] - cum[ptr] > max_tokens:
+            ptr = end
+
+# ── Page tracking ──
+# Clean page by page (same words as cleaning the whole text, since pages end in
+# whitespace) and return the cleaned text plus the first word index of each page
+def clean_pages(doc: str, page_offsets):
+    bounds = list(page_offsets) + [len(doc)]
+    pages = [clean(doc[bounds[i]:bounds[i + 1]]) for i in range(len(page_offsets))]
+    word_counts = [len(p.split()) for p in pages]
+    first_word = np.zeros(len(pages), dtype=np.int64)
+    np.cumsum(word_counts[:-1], out=first_word[1:])
+    return " ".join(p for p in pages if p), first_word
+
+# ── Streaming preprocessing ──
+# Cleans and chunks a stream of (text, metadata) documents one at a time;
+# yields (chunk_text, chunk_metadata) so nothing is held beyond one document.
+# Chunk metadata is only doc_id / chunk_id / tokens, plus the 1-based page span
+# when the loader recorded page offsets; document fields are not copied.
+def iter_chunks(doc_stream, *, max_tokens=400, overlap=30, strategy="semantic", first_doc_id=0):
+    for doc_id, (doc, source_meta) in enumerate(doc_stream, start=first_doc_id):
+        page_offsets = source_meta.get("page_offsets")
+
+        if page_offsets:
+            cleaned, first_word = clean_pages(doc, page_offsets)
+        else:
+            cleaned, first_word = clean(doc), None  # Clean the text
+
+        # Tokenize the document once; chunk boundaries and counts come from it
+        words = cleaned.split()
+        counts = word_token_counts(cleaned, words) if words else np.zeros(0, dtype=np.int64)
+        words, counts, word_index = split_long_words(words, counts, max_tokens)
+        if first_word is not None:
+            first_word = word_index[first_word]  # page starts in the split word list
+        cum = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(counts, out=cum[1:])
 
-        # Ensure token count is within limit
-        while len(ENCODER.encode(" ".join(chunk_words))) > max_tokens:
-            chunk_words = chunk_words[:-1]
+        # Chunk the cleaned text and generate metadata for each chunk
+        for ck_id, (start, end, count) in enumerate(chunk_spans(words, cum, max_tokens, overlap, strategy)):
+            chunk_meta = {
+                "doc_id": doc_id,
+                "chunk_id": ck_id,
+                "tokens": count,  # standalone token count of the chunk text
+            }
 
-        yield " ".join(chunk_words)
+            if first_word is not None:
+                # page i + 1 starts at word first_word[i]
+                chunk_meta["page_start"] = int(np.searchsorted(first_word, start, side="right"))
+                chunk_meta["page_end"] = int(np.searchsorted(first_word, end - 1, side="right"))
 
-        # Slide window forward
-        ptr += max_tokens - overlap
+            yield " ".join(words[start:end]), chunk_meta
 
 # ── Main preprocessing function ──
 # Cleans and chunks each document; returns text chunks and detailed metadata
@@ -81,28 +216,19 @@ def preprocess(docs, meta_in, *, max_tokens=400, overlap=30, strategy="semantic"
 
     Returns:
         - chunks: list of text chunks
-        - meta_out: list of metadata dicts for each chunk
+        - meta_out: list of compact chunk metadata dicts (see iter_chunks)
     """
     chunks, meta_out = [], []
     print('in the PREPROCESS')
 
     # Iterate over each document (handles lists-of-lists)
-    for doc_id, doc in enumerate(itertools.chain.from_iterable(
-            d if isinstance(d, list) else [d] for d in docs)):
+    flat_docs = itertools.chain.from_iterable(
+        d if isinstance(d, list) else [d] for d in docs)
 
-        cleaned = clean(doc)  # Clean the text
-        source_meta = meta_in[doc_id]  # Original document metadata
-
-        # Chunk the cleaned text and generate metadata for each chunk
-        for ck_id, ck in enumerate(chunk(cleaned, max_tokens, overlap, strategy)):
-            chunk_meta = {
-                "doc_id": doc_id,
-                "chunk_id": ck_id,
-                "tokens": len(ENCODER.encode(ck)),  # token count of the chunk
-                **source_meta  # inherit and merge original metadata
-            }
-            chunks.append(ck)
-            meta_out.append(chunk_meta)
+    for ck, chunk_meta in iter_chunks(zip(flat_docs, meta_in), max_tokens=max_tokens,
+                                      overlap=overlap, strategy=strategy):
+        chunks.append(ck)
+        meta_out.append(chunk_meta)
 
     return chunks, meta_out
 
@@ -110,7 +236,6 @@ def preprocess(docs, meta_in, *, max_tokens=400, overlap=30, strategy="semantic"
 
 
 
-
 # """
 # Text cleaning + chunking that keeps accurate LLaMA token counts and
 # emits rich, per-chunk metadata for citations.
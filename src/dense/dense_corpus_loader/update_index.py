@@ -0,0 +1,251 @@
+"""
+Incremental dense index updates: add or remove documents without a rebuild.
+Chunk ids are stable (row in the chunk text store), so only new documents are
+extracted, chunked and embedded, and their vectors are appended under new
+ids. Removed documents are deleted from the index by id and tombstoned
+(null, or doc_id -1 in the metadata store) in the stores, so every other
+row keeps its id.
+
+ensure_fresh() is the startup check: it compares the build manifest (see
+index_manifest.py) with the PDF directory and then skips, applies the
+added / removed / changed files incrementally, or rebuilds when the
+preprocessing config, the embedding model or the document metadata changed.
+
+Run from src/:
+  python -m dense.dense_corpus_loader.update_index add data/pdfs/new_book.pdf
+  python -m dense.dense_corpus_loader.update_index remove old_book.pdf
+  python -m dense.dense_corpus_loader.update_index sync   # same check as startup
+"""
+import os
+import json
+import argparse
+import numpy as np
+from corpus_preloader.load_pdfs import iter_pdf_files
+from corpus_preloader.load_all_data import PDF_DIR
+from dense import faiss_index
+from dense.dense_corpus_loader.preprocess import iter_chunks
+from dense.dense_corpus_loader.pipeline import batched, append_json_array, JsonArrayWriter
+from dense.dense_corpus_loader.build_index import (INDEX_DIR, INDEX_FILE, MANIFEST, METADATA_DIR, TEXT_DIR,
+                                                   RAW_TEXT_DIR, EMBED_BATCH, CHUNK_TOKENS, CHUNK_OVERLAP,
+                                                   CHUNK_STRATEGY, build, embed, manifest_config,
+                                                   open_embedding_cache, report_cache)
+from metadata_store import MetadataStore, MetadataStoreWriter
+from text_store import TextStore, TextStoreWriter
+import index_manifest
+
+INDEX_PATH = os.path.join(INDEX_DIR, INDEX_FILE)
+METADATA_PATH = os.path.join(INDEX_DIR, METADATA_DIR)
+TEXT_PATH = os.path.join(INDEX_DIR, TEXT_DIR)
+RAW_TEXT_PATH = os.path.join(INDEX_DIR, RAW_TEXT_DIR)
+
+def _path(name):
+    return os.path.join(INDEX_DIR, name)
+
+def _load_json(name):
+    with open(_path(name), "r") as f:
+        return json.load(f)
+
+# Rewrite a JSON array with some rows replaced by null (ids of other rows unchanged)
+def _tombstone(name, rows, ids):
+    ids = set(ids)
+    with JsonArrayWriter(_path(name)) as writer:
+        for i, row in enumerate(rows):
+            writer.write(None if i in ids else row)
+
+def load_metadata():
+    return MetadataStore.load_or_migrate(METADATA_PATH, _path("dense_metadata.json"))
+
+# Convert stores left as JSON by older builds before updating them
+def migrate_stores():
+    load_metadata()
+    TextStore.load_or_migrate(TEXT_PATH, _path("dense_corpus.json"))
+    TextStore.load_or_migrate(RAW_TEXT_PATH, _path("raw_corpus.json"))
+
+def load_for_update():
+    if not os.path.exists(INDEX_PATH):
+        raise FileNotFoundError(f"No dense index at {INDEX_PATH}; run build() first.")
+    params = faiss_index.load_params(INDEX_DIR)
+    index = faiss_index.read_index(INDEX_PATH, params, INDEX_DIR)
+    return faiss_index.ensure_id_mapped(index, params), params
+
+# Index written last and atomically: stores never point past what it holds
+def save_index(index, params):
+    faiss_index.save_params(INDEX_DIR, params)
+    tmp_path = INDEX_PATH + ".tmp"
+    faiss_index.write_index(index, tmp_path)
+    os.replace(tmp_path, INDEX_PATH)
+
+# Live documents by file name -> doc_id (from the store's document table)
+def indexed_files(documents=None):
+    documents = load_metadata().documents if documents is None else documents
+    return {os.path.basename(meta.get("filepath") or meta.get("filename") or ""): doc_id
+            for doc_id, meta in enumerate(documents) if meta is not None}
+
+def add_documents(doc_stream):
+    """
+    Chunk, embed and append a stream of (text, metadata) documents.
+    Returns the doc_ids assigned to them.
+    """
+    index, params = load_for_update()
+    migrate_stores()
+    doc_meta = []
+    n_chunks = 0
+    cache = open_embedding_cache()
+
+    # Texts and metadata rows stream onto the end of the stores; they only
+    # become visible when the writers close cleanly (an error leaves the
+    # stores as they were), and the index is saved after that
+    with MetadataStoreWriter(METADATA_PATH, append=True) as store:
+        # Store lengths are the source of truth for the next ids
+        first_doc_id = store.n_documents
+        first_chunk_id = store.n_chunks
+
+        with TextStoreWriter(RAW_TEXT_PATH, append=True) as raw_docs, \
+             TextStoreWriter(TEXT_PATH, append=True) as corpus:
+
+            def record(stream):
+                for doc, meta in stream:
+                    raw_docs.write(doc)
+                    doc_meta.append(meta)
+                    store.write_document(meta)
+                    yield doc, meta
+
+            chunks = iter_chunks(record(doc_stream), max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP,
+                                 strategy=CHUNK_STRATEGY, first_doc_id=first_doc_id)
+            for batch in batched(chunks, EMBED_BATCH):
+                start = first_chunk_id + n_chunks
+                index.add_with_ids(embed([text for text, _ in batch], cache),
+                                   np.arange(start, start + len(batch), dtype=np.int64))
+                for text, meta in batch:
+                    corpus.write(text)
+                    store.write_chunk(meta)
+                n_chunks += len(batch)
+
+        if not doc_meta:
+            print("ℹ️ No documents to add.")
+            return []
+
+        append_json_array(_path("raw_metadata.json"), doc_meta)
+    save_index(index, params)
+
+    report_cache(cache)
+    print(f"➕ Added {len(doc_meta)} document(s), {n_chunks} chunks (index now {index.ntotal}).")
+    return list(range(first_doc_id, first_doc_id + len(doc_meta)))
+
+def remove_documents(doc_ids):
+    """Delete every chunk of the given doc_ids from the index and the stores."""
+    doc_ids = set(doc_ids)
+    if not doc_ids:
+        return 0
+    index, params = load_for_update()
+    migrate_stores()
+
+    metadata = load_metadata()
+    chunk_ids = metadata.chunks_of(doc_ids)
+
+    # Indexes that can't delete (HNSW) keep the vectors; retrieval skips the
+    # tombstoned rows and over-fetches by n_deleted to still return k hits
+    removed = faiss_index.remove_ids(index, chunk_ids)
+    params["n_deleted"] = params.get("n_deleted", 0) + len(chunk_ids) - removed
+
+    TextStore.remove(TEXT_PATH, chunk_ids)
+    metadata.tombstone(chunk_ids, doc_ids).save(METADATA_PATH)
+    TextStore.remove(RAW_TEXT_PATH, doc_ids)
+    _tombstone("raw_metadata.json", _load_json("raw_metadata.json"), doc_ids)
+    save_index(index, params)
+
+    print(f"➖ Removed {len(doc_ids)} document(s), {len(chunk_ids)} chunks (index now {index.ntotal}).")
+    return len(chunk_ids)
+
+# Keep the manifest's source list in step with manual adds / removes, so the
+# startup check neither re-adds nor drops them. Only files in the tracked PDF
+# directory are recorded; without a manifest there is nothing to keep in step.
+def record_sources(added=(), removed=()):
+    manifest = index_manifest.load(INDEX_DIR, MANIFEST)
+    if manifest is None:
+        return
+    tracked = os.path.normpath(PDF_DIR)
+    removed_names = {os.path.basename(f) for f in removed}
+    sources = {path: entry for path, entry in manifest["sources"].items()
+               if os.path.basename(path) not in removed_names}
+    added = [os.path.join(PDF_DIR, os.path.basename(f)) for f in added
+             if os.path.dirname(os.path.normpath(f)) == tracked and os.path.exists(f)]
+    sources.update(index_manifest.scan(added))
+    index_manifest.save(INDEX_DIR, MANIFEST, manifest["config"], manifest["index"], sources)
+
+def add_pdfs(file_paths):
+    file_paths = list(file_paths)
+    doc_ids = add_documents(iter_pdf_files(file_paths))
+    record_sources(added=file_paths)
+    return doc_ids
+
+def remove_files(filenames):
+    filenames = list(filenames)
+    by_name = indexed_files()
+    n_chunks = remove_documents(by_name[os.path.basename(f)] for f in filenames if os.path.basename(f) in by_name)
+    record_sources(removed=filenames)
+    return n_chunks
+
+def ensure_fresh():
+    """
+    Startup check: bring the dense index in line with its inputs. Unchanged
+    files are recognized by size + mtime, so a fresh index costs a stat per
+    file. Returns the index_manifest.Plan that was applied.
+    """
+    manifest = index_manifest.load(INDEX_DIR, MANIFEST)
+    plan = index_manifest.check(INDEX_DIR, MANIFEST, manifest_config(), os.path.exists(INDEX_PATH))
+
+    if plan.action == "skip":
+        print("✅ Dense index is up to date.")
+        index_manifest.refresh(INDEX_DIR, MANIFEST, plan)
+    elif plan.action == "rebuild":
+        print(f"🔧 Rebuilding dense index: {plan.reason}.")
+        # Same index configuration as the build being replaced
+        build(**(manifest["index"] if manifest else {}), force=True)
+    else:
+        print(f"🔄 Updating dense index: {plan.reason}.")
+        # Until the update is through, the index matches neither manifest
+        index_manifest.invalidate(INDEX_DIR, MANIFEST)
+        indexed = indexed_files()
+        # Changed files are replaced; an "added" file that is already indexed
+        # (an update interrupted before its manifest was saved) is too
+        stale = plan.removed + plan.changed + [f for f in plan.added if os.path.basename(f) in indexed]
+        remove_documents(indexed[os.path.basename(f)] for f in stale if os.path.basename(f) in indexed)
+        if plan.added or plan.changed:
+            add_documents(iter_pdf_files(plan.added + plan.changed))
+        index_manifest.save(INDEX_DIR, MANIFEST, manifest["config"], manifest["index"], plan.sources)
+    return plan
+
+# Make the index match a PDF directory by file name: add new files, remove deleted ones
+def sync_pdfs(path=PDF_DIR):
+    on_disk = {f for f in os.listdir(path) if f.endswith(".pdf")}
+    by_name = indexed_files()
+
+    removed = [doc_id for name, doc_id in by_name.items() if name.endswith(".pdf") and name not in on_disk]
+    added = sorted(on_disk - by_name.keys())
+    if removed:
+        remove_documents(removed)
+        record_sources(removed=[name for name, doc_id in by_name.items() if doc_id in removed])
+    if added:
+        add_pdfs([os.path.join(path, f) for f in added])
+    if not (added or removed):
+        print("✅ Dense index is up to date.")
+    return added, removed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("add").add_argument("files", nargs="+")
+    sub.add_parser("remove").add_argument("files", nargs="+")
+    sub.add_parser("sync").add_argument("--path", default=None,
+                                        help="sync by file name with another directory")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        add_pdfs(args.files)
+    elif args.command == "remove":
+        remove_files(args.files)
+    elif args.path is None:
+        ensure_fresh()
+    else:
+        sync_pdfs(args.path)
@@ -0,0 +1,46 @@
+"""
+Process-wide embedding model shared by the dense build, retrieval and eval.
+The model (and the torch import behind it) is loaded on first use, so
+importing the dense modules stays cheap; prewarm() loads it in a background
+thread while something else (e.g. the LLM) is loading.
+
+EMBEDDING_BACKEND selects how the model runs (env var of the same name):
+  torch      sentence-transformers on PyTorch (default)
+  onnx       exported ONNX graph on onnxruntime (CPU)
+  onnx-int8  same graph, int8 dynamically quantized
+All backends expose the same encode() contract.
+"""
+import os
+from lazy_singleton import LazySingleton
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+# Identifies the vectors a configuration produces (cache keys, build records);
+# ONNX ids include the export version, since a new export means new vectors
+def model_id(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+    if backend == "torch":
+        return f"{model_name}:{backend}"
+    from dense.onnx_encoder import EXPORT_VERSION
+    return f"{model_name}:{backend}-v{EXPORT_VERSION}"
+
+def load_model(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Invalid embedding backend '{backend}'. Choose one of {EMBEDDING_BACKENDS}.")
+
+    print(f"🤖 Loading embedding model: {model_name} ({backend})")
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer  # heavy import, deferred
+        return SentenceTransformer(model_name)
+
+    from dense.onnx_encoder import OnnxEncoder
+    return OnnxEncoder(model_name, quantize=backend == "onnx-int8")
+
+_model = LazySingleton(lambda: load_model())
+
+def get_model():
+    return _model.get()
+
+def prewarm():
+    return _model.prewarm()
@@ -0,0 +1,107 @@
+"""
+Content-addressed cache of chunk embeddings.
+Rows are keyed by hash(model id, chunk text) and stored in two append-only
+files per model: keys.bin (16-byte digests) and vectors.bin (float32 or
+float16 rows), memory-mapped for reads. Rebuilding the index with other
+parameters (or after losing it) only encodes chunks whose text is new.
+"""
+import os
+import json
+import hashlib
+import numpy as np
+
+CACHE_DIR = "data/embedding_cache"
+KEY_BYTES = 16
+
+
+def chunk_key(model_id, text):
+    return hashlib.blake2b(f"{model_id}\0{text}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, model_id, dtype="float32", cache_dir=CACHE_DIR):
+        self.model_id = model_id
+        self.dtype = np.dtype(dtype)
+        self.dir = os.path.join(cache_dir, model_id.replace("/", "__").replace(":", "--") + f"-{self.dtype.name}")
+        os.makedirs(self.dir, exist_ok=True)
+        self.keys_path = os.path.join(self.dir, "keys.bin")
+        self.vectors_path = os.path.join(self.dir, "vectors.bin")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.stats = {"hits": 0, "misses": 0}
+
+        self.dim = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                self.dim = json.load(f)["dim"]
+
+        # Drop rows an interrupted append left half-written, keeping files aligned
+        n_rows = 0
+        if self.dim is not None and os.path.exists(self.keys_path) and os.path.exists(self.vectors_path):
+            n_rows = min(os.path.getsize(self.keys_path) // KEY_BYTES,
+                         os.path.getsize(self.vectors_path) // (self.dim * self.dtype.itemsize))
+        for path, row_bytes in ((self.keys_path, KEY_BYTES), (self.vectors_path, (self.dim or 0) * self.dtype.itemsize)):
+            with open(path, "ab") as f:
+                f.truncate(n_rows * row_bytes)
+
+        with open(self.keys_path, "rb") as f:
+            keys = f.read()
+        self.rows = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(n_rows)}
+        self._vectors = None
+        self._mapped = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Memory map covering at least row `i` (remapped after appends)
+    def _mapped_vectors(self, i):
+        if i >= self._mapped:
+            self._mapped = len(self.rows)
+            self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r",
+                                      shape=(self._mapped, self.dim))
+        return self._vectors
+
+    def get_many(self, texts):
+        """
+        Cached vectors for `texts` as float32 (misses left zero, None if the
+        cache is empty) and the positions of the misses.
+        """
+        rows = [self.rows.get(chunk_key(self.model_id, t)) for t in texts]
+        hits = [i for i, row in enumerate(rows) if row is not None]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        self.stats["hits"] += len(hits)
+        self.stats["misses"] += len(missing)
+
+        if self.dim is None:
+            return None, missing
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if hits:
+            hit_rows = np.array([rows[i] for i in hits])
+            vectors[hits] = self._mapped_vectors(hit_rows.max())[hit_rows]
+        return vectors, missing
+
+    # Append new rows (vectors, then keys); a torn append is trimmed on the next open
+    def put_many(self, texts, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self.meta_path, "w") as f:
+                json.dump({"model": self.model_id, "dim": self.dim, "dtype": self.dtype.name}, f)
+
+        new = {}
+        for text, vector in zip(texts, vectors):
+            key = chunk_key(self.model_id, text)
+            if key not in self.rows and key not in new:
+                new[key] = vector
+        if not new:
+            return
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.stack(list(new.values())).tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.write(b"".join(new))
+        for key in new:
+            self.rows[key] = len(self.rows)
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
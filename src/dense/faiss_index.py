@@ -0,0 +1,205 @@
+"""
+Configurable FAISS index types for the dense index.
+  flat      exact inner product (brute force)
+  hnsw      graph ANN; search-time knob: ef_search
+  ivf_flat  inverted lists over full vectors; search-time knob: nprobe
+  ivf_pq    inverted lists over product-quantized vectors; knob: nprobe
+  binary    sign-bit Hamming first pass, exact float rescoring from disk;
+            knob: rescore_factor (see binary_index.py)
+Vector storage (flat, hnsw, ivf_flat): fp32, fp16 or sq8 (8-bit scalar
+quantizer: 4x smaller), optionally after a PCA projection to pca_dim dims.
+The binary type keeps its rescoring vectors as fp32 or fp16 (sq8 -> fp16).
+Build-time choices and search-time parameters are saved next to the index
+(dense_index.json) so retrieval applies them automatically.
+
+Vectors are stored under stable chunk ids (their row in the chunk text store):
+flat and HNSW are wrapped in IDMap2, IVF stores ids natively. That is what
+lets documents be added and removed incrementally (see update_index.py).
+"""
+import os
+import json
+import math
+import numpy as np
+import faiss
+from dense.binary_index import BinaryRescoreIndex, VECTORS_FILE
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "binary")
+STORAGE_TYPES = ("fp32", "fp16", "sq8")
+CODECS = {"fp32": "Flat", "fp16": "SQfp16", "sq8": "SQ8"}
+PARAMS_FILE = "dense_index.json"
+
+DEFAULT_PARAMS = {
+    "hnsw_m": 32,             # graph degree
+    "ef_construction": 200,   # build-time beam width
+    "ef_search": 64,          # search-time beam width
+    "nlist": None,            # IVF lists; None -> ~4*sqrt(n_train)
+    "nprobe": 16,             # IVF lists scanned per query
+    "pq_m": 48,               # PQ sub-quantizers (must divide dim)
+    "pq_nbits": 8,            # bits per PQ code
+    "rescore_factor": 10,     # binary: candidates rescored per requested hit
+    "storage": "fp32",        # vector codes: fp32 | fp16 | sq8 (ivf_pq has its own)
+    "pca_dim": None,          # PCA output dims (None = no reduction)
+    "train_size": 50000,      # vectors sampled for IVF/PQ/SQ8/PCA training
+    "n_deleted": 0,           # removed chunks still in an index without remove_ids (HNSW)
+}
+
+# IVF centroids, SQ8 value ranges and PCA all learn from a sample
+def needs_training(params):
+    if params["index_type"] == "binary":
+        return False
+    return (params["index_type"] in ("ivf_flat", "ivf_pq") or params["storage"] == "sq8"
+            or bool(params["pca_dim"]))
+
+# Fill in defaults and resolve sizes that depend on the training sample
+def resolve_params(index_type, params=None, n_train=None):
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Invalid index type '{index_type}'. Choose one of {INDEX_TYPES}.")
+
+    resolved = {**DEFAULT_PARAMS, **(params or {}), "index_type": index_type}
+    if resolved["storage"] not in STORAGE_TYPES:
+        raise ValueError(f"Invalid storage '{resolved['storage']}'. Choose one of {STORAGE_TYPES}.")
+    if index_type == "binary" and resolved["pca_dim"]:
+        raise ValueError("PCA is not supported for the binary index type.")
+
+    if index_type in ("ivf_flat", "ivf_pq") and n_train:
+        # k-means wants ~39 points per centroid
+        nlist = resolved["nlist"] or int(4 * math.sqrt(n_train))
+        resolved["nlist"] = max(1, min(nlist, n_train // 39))
+        resolved["nprobe"] = min(resolved["nprobe"], resolved["nlist"])
+        if index_type == "ivf_pq":
+            resolved["pq_nbits"] = max(1, min(resolved["pq_nbits"], int(math.log2(max(n_train // 39, 2)))))
+    return resolved
+
+# FAISS factory string for a resolved configuration
+def factory_string(params):
+    index_type = params["index_type"]
+    codec = CODECS[params["storage"]]
+    # Re-normalize after the projection so inner product stays cosine similarity
+    pca = f"PCA{params['pca_dim']},L2norm," if params["pca_dim"] else ""
+
+    if index_type == "flat":
+        return f"IDMap2,{pca}{codec}"
+    if index_type == "hnsw":
+        suffix = "" if params["storage"] == "fp32" else f"_{codec}"
+        return f"IDMap2,{pca}HNSW{params['hnsw_m']}{suffix}"
+    if index_type == "ivf_flat":
+        return f"{pca}IVF{params['nlist']},{codec}"
+    if index_type == "binary":
+        return f"IDMap2,BFlat + {binary_dtype(params)} rescoring"
+    return f"{pca}IVF{params['nlist']},PQ{params['pq_m']}x{params['pq_nbits']}"
+
+def binary_dtype(params):
+    return "float32" if params["storage"] == "fp32" else "float16"
+
+# Create an empty inner-product index (cosine sim on normalized vectors).
+# The binary type streams its float vectors to index_dir while adding.
+def make_index(dim, params, index_dir="index"):
+    if params["index_type"] == "binary":
+        vectors_path = os.path.join(index_dir, VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            os.remove(vectors_path)  # stale rows from an earlier build
+        return BinaryRescoreIndex(dim, vectors_path, binary_dtype(params), params["rescore_factor"])
+    if params["index_type"] == "ivf_pq":
+        # PQ sub-quantizers must split the (projected) vector evenly
+        d = params["pca_dim"] or dim
+        params["pq_m"] = max(m for m in range(1, params["pq_m"] + 1) if d % m == 0)
+    index = faiss.index_factory(dim, factory_string(params), faiss.METRIC_INNER_PRODUCT)
+    hnsw = find_hnsw(index)
+    if hnsw is not None:
+        hnsw.efConstruction = params["ef_construction"]
+    return index
+
+# Index inside an id map and/or PCA pre-transform (or the index itself)
+def unwrap(index):
+    if isinstance(index, BinaryRescoreIndex):
+        return index
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    return index
+
+def find_hnsw(index):
+    index = unwrap(index)
+    return index.hnsw if isinstance(index, faiss.IndexHNSW) else None
+
+def find_ivf(index):
+    if isinstance(index, BinaryRescoreIndex):
+        return None
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+# Indexes that take add_with_ids / remove_ids by chunk id
+def has_ids(index):
+    if isinstance(index, BinaryRescoreIndex):
+        return True
+    index = faiss.downcast_index(index)
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) or find_ivf(index) is not None
+
+# Re-add a positional index (built before chunk ids) into an id-mapped one
+# of the same type, so row i keeps id i. One-time migration on first update.
+def ensure_id_mapped(index, params):
+    if has_ids(index):
+        return index
+    vectors = index.reconstruct_n(0, index.ntotal)
+    id_mapped = make_index(index.d, params)
+    id_mapped.add_with_ids(vectors, np.arange(index.ntotal, dtype=np.int64))
+    return id_mapped
+
+# Delete chunk ids from the index; returns how many were actually removed
+# (0 when the index type can't remove, e.g. HNSW: callers tombstone instead)
+def remove_ids(index, ids):
+    if len(ids) == 0:
+        return 0
+    try:
+        return index.remove_ids(faiss.IDSelectorBatch(np.asarray(ids, dtype=np.int64)))
+    except RuntimeError:
+        return 0
+
+# Apply persisted search-time parameters (nprobe / efSearch)
+def apply_search_params(index, params):
+    if isinstance(index, BinaryRescoreIndex):
+        index.rescore_factor = params["rescore_factor"]
+    ivf = find_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = params["nprobe"]
+    hnsw = find_hnsw(index)
+    if hnsw is not None:
+        hnsw.efSearch = params["ef_search"]
+
+# Per-call search parameters carrying an IDSelector (metadata filters).
+# IVF / HNSW need their own parameter classes, which also carry the knobs.
+def search_parameters(index, params, selector):
+    if find_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=params["nprobe"])
+    if find_hnsw(index) is not None:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=params["ef_search"])
+    return faiss.SearchParameters(sel=selector)
+
+# Read / write the index file for any type (binary indexes use FAISS's binary I/O)
+def read_index(path, params, index_dir="index"):
+    if params["index_type"] == "binary":
+        return BinaryRescoreIndex.read(path, os.path.join(index_dir, VECTORS_FILE),
+                                       binary_dtype(params), params["rescore_factor"])
+    return faiss.read_index(path)
+
+def write_index(index, path):
+    if isinstance(index, BinaryRescoreIndex):
+        index.write(path)
+    else:
+        faiss.write_index(index, path)
+
+def save_params(index_dir, params):
+    with open(os.path.join(index_dir, PARAMS_FILE), "w") as f:
+        json.dump(params, f, indent=2)
+
+# Saved parameters; indexes built before this file existed are flat
+def load_params(index_dir):
+    path = os.path.join(index_dir, PARAMS_FILE)
+    if not os.path.exists(path):
+        return resolve_params("flat")
+    with open(path, "r") as f:
+        return {**DEFAULT_PARAMS, **json.load(f)}  # files from older builds lack newer keys
@@ -0,0 +1,124 @@
+"""
+CPU embedding backend that runs the model's transformer as an ONNX graph
+(optionally int8 dynamically quantized) with onnxruntime.
+Reproduces the sentence-transformers pipeline for all-MiniLM-L6-v2
+(transformer -> mean pooling -> L2 normalize) in numpy and exposes the same
+encode() contract, so build and retrieval can swap it in via config.
+
+onnxruntime is optional: it is imported only when this backend is selected.
+The graph is exported once with torch (and quantized once) and reused from
+ONNX_DIR afterwards; later runs don't need torch at all.
+"""
+import os
+import inspect
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join(BASE_DIR, "../model/onnx"))
+
+MAX_SEQ_LENGTH = 256  # same truncation as the sentence-transformers model config
+OPSET = 14
+# Bumped when the exported graph changes: older files (and the embeddings
+# cached from them, see embedding.model_id) are not reused.
+# 2 = inputs in forward() order (1 swapped attention_mask and token_type_ids)
+EXPORT_VERSION = 2
+
+# File of the exported graph, e.g. all-MiniLM-L6-v2-v2-int8.onnx
+def onnx_path(model_name, quantize=False, onnx_dir=ONNX_DIR):
+    name = f"{model_name.rsplit('/', 1)[-1]}-v{EXPORT_VERSION}"
+    return os.path.join(onnx_dir, f"{name}-int8.onnx" if quantize else f"{name}.onnx")
+
+# Export the Hugging Face transformer to ONNX (and quantize it) if missing
+def export_onnx(model_name, quantize=False, onnx_dir=ONNX_DIR):
+    os.makedirs(onnx_dir, exist_ok=True)
+    fp32_path = onnx_path(model_name, False, onnx_dir)
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        print(f"📤 Exporting {model_name} to ONNX...")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+
+        dummy = tokenizer(["export"], return_tensors="pt")
+        # Inputs are passed positionally, so they must follow forward()'s order
+        # (input_ids, attention_mask, token_type_ids), not the tokenizer's
+        input_names = [name for name in inspect.signature(model.forward).parameters if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names + ["last_hidden_state"]}
+
+        tmp_path = fp32_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(model, tuple(dummy[name] for name in input_names), tmp_path,
+                              input_names=input_names, output_names=["last_hidden_state"],
+                              dynamic_axes=dynamic_axes, opset_version=OPSET)
+        os.replace(tmp_path, fp32_path)
+
+    if quantize:
+        int8_path = onnx_path(model_name, True, onnx_dir)
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            print("🗜️ Quantizing ONNX graph to int8 (dynamic)...")
+            tmp_path = int8_path + ".tmp"
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+
+    return onnx_path(model_name, quantize, onnx_dir)
+
+
+class OnnxEncoder:
+    """
+    Drop-in for SentenceTransformer.encode() as used in this repo: takes a
+    string or a list of strings and returns L2-normalized float32 numpy
+    embeddings (1-D for a single string).
+    """
+
+    def __init__(self, model_name, quantize=False, onnx_dir=ONNX_DIR, n_threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = onnx_path(model_name, quantize, onnx_dir)
+        if not os.path.exists(path):
+            path = export_onnx(model_name, quantize, onnx_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if n_threads:
+            options.intra_op_num_threads = n_threads
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encoded = self.tokenizer(texts, padding=True, truncation=True,
+                                 max_length=MAX_SEQ_LENGTH, return_tensors="np")
+        feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalize (cosine sim)
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    # Extra SentenceTransformer kwargs (show_progress_bar, convert_to_tensor...) are ignored
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if not sentences:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Longest first, so each batch pads to similar lengths (as sentence-transformers does)
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        parts = [self._encode_batch([sentences[i] for i in order[start:start + batch_size]])
+                 for start in range(0, len(sentences), batch_size)]
+
+        stacked = np.vstack(parts)
+        embeddings = np.empty_like(stacked)
+        embeddings[order] = stacked
+        return embeddings[0] if single else embeddings
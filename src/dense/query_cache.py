@@ -0,0 +1,82 @@
+"""
+Query-embedding cache: repeated queries skip the transformer entirely.
+Keys are (model id, normalized query text). Tier 1 is an in-memory LRU
+(OrderedDict); tier 2 is an optional diskcache.Cache shared across runs,
+which is cleared when it was filled by a different embedding model.
+"""
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+_MODEL_KEY = "__model__"
+
+# Same text modulo Unicode form and whitespace -> same embedding
+def normalize_query(text):
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, model_id, max_items=10000, disk_dir=None, disk_size_limit=256 * 2**20):
+        self.model_id = model_id
+        self.max_items = max_items
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._disk = None
+        if disk_dir:
+            import diskcache  # optional tier
+
+            self._disk = diskcache.Cache(disk_dir, size_limit=disk_size_limit)
+            if self._disk.get(_MODEL_KEY) != model_id:
+                self._disk.clear()  # embeddings from another model are useless
+                self._disk.set(_MODEL_KEY, model_id)
+
+    def _key(self, text):
+        return (self.model_id, normalize_query(text))
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)  # least recently used
+
+    # Cached vector for a query, or None on a miss
+    def get(self, text):
+        key = self._key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return vector
+
+        vector = self._disk.get(key) if self._disk is not None else None
+        with self._lock:
+            if vector is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            self._remember(key, vector)
+        return vector
+
+    def put(self, text, vector):
+        key = self._key(text)
+        # A copy: a row view would keep the caller's whole batch matrix alive
+        vector = np.array(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+        if self._disk is not None:
+            self._disk.set(key, vector)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+            self._disk.set(_MODEL_KEY, self.model_id)
+
+    def __len__(self):
+        return len(self._memory)
@@ -1,58 +1,119 @@
 import os
-import json
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
+from dense import faiss_index as index_types
+from dense.embedding import EMBEDDING_MODEL, get_model, model_id
+from dense.query_cache import QueryEmbeddingCache, normalize_query
+from metadata_filter import MetadataIndex
+from metadata_store import MetadataStore
+from text_store import TextStore
 
 # Paths
 INDEX_DIR = "index"
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+METADATA_DIR = "dense_meta"  # columnar chunk metadata (see metadata_store.py)
+TEXT_DIR = "dense_text"      # memory-mapped chunk texts (see text_store.py)
+
+# Query-embedding cache: in-memory LRU, plus a disk tier when a directory is set
+USE_QUERY_CACHE = True
+QUERY_CACHE_SIZE = 10000
+QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR")  # e.g. "index/query_cache"
 
 # Globals
 faiss_index = None
-dense_corpus = None
-dense_metadata = None
-model = SentenceTransformer(EMBEDDING_MODEL)
+dense_corpus = None  # TextStore: only returned chunks are decoded
+dense_metadata = None  # MetadataStore: hit dicts are built only for returned chunks
+query_cache = None
+metadata_index = None  # per-value chunk bitmaps for filtered search
+index_params = None
+n_deleted = 0  # removed chunks still in the index (types without remove_ids)
 
 # Load dense index and related data
 def load_dense_index():
-    global faiss_index, dense_corpus, dense_metadata
+    global faiss_index, dense_corpus, dense_metadata, metadata_index, index_params, n_deleted
     if faiss_index is not None:
         return
 
-    # Load FAISS index
+    # Load FAISS index and apply its persisted search-time params (nprobe / efSearch)
     index_path = os.path.join(INDEX_DIR, "dense_index.faiss")
-    faiss_index = faiss.read_index(index_path)
+    index_params = index_types.load_params(INDEX_DIR)
+    faiss_index = index_types.read_index(index_path, index_params, INDEX_DIR)
+    index_types.apply_search_params(faiss_index, index_params)
+    n_deleted = index_params.get("n_deleted", 0)
 
-    # Load corpus and metadata
-    with open(os.path.join(INDEX_DIR, "dense_corpus.json"), "r") as f:
-        dense_corpus = json.load(f)
-    with open(os.path.join(INDEX_DIR, "dense_metadata.json"), "r") as f:
-        dense_metadata = json.load(f)
+    # Load corpus and metadata (indexes built before the memory-mapped /
+    # columnar stores are converted on first load)
+    dense_corpus = TextStore.load_or_migrate(os.path.join(INDEX_DIR, TEXT_DIR),
+                                             os.path.join(INDEX_DIR, "dense_corpus.json"))
+    dense_metadata = MetadataStore.load_or_migrate(os.path.join(INDEX_DIR, METADATA_DIR),
+                                                   os.path.join(INDEX_DIR, "dense_metadata.json"))
+    metadata_index = MetadataIndex.from_store(dense_metadata)
 
-# Retrieve top-k similar chunks using dense retrieval
-def retrieve(query: str, k=5):
-    load_dense_index()
+def get_query_cache():
+    global query_cache
+    if query_cache is None:
+        query_cache = QueryEmbeddingCache(model_id(), QUERY_CACHE_SIZE, QUERY_CACHE_DIR)
+    return query_cache
+
+# Encode queries in one model call and normalize them together (cosine sim)
+def _encode(queries):
+    query_vectors = get_model().encode(queries, batch_size=64)
+    query_vectors = np.array(query_vectors).astype("float32")
+
+    # Normalize the query vectors - ONLY COSINE SIM
+    faiss.normalize_L2(query_vectors)
+    return query_vectors
 
-    # Encode query
-    query_vector = model.encode([query])
-    query_vector = np.array(query_vector).astype("float32")
+# Query vectors, encoding only the (distinct) queries the cache doesn't have
+def encode_queries(queries):
+    if not USE_QUERY_CACHE:
+        return _encode(queries)
 
+    cache = get_query_cache()
+    keys = [normalize_query(q) for q in queries]
+    vectors = [cache.get(key) for key in keys]
+    missing = list(dict.fromkeys(key for key, v in zip(keys, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, _encode(missing)))
+        for key, v in fresh.items():
+            cache.put(key, v)
+        vectors = [fresh[key] if v is None else v for key, v in zip(keys, vectors)]
+    return np.vstack(vectors)
 
-    # Normalize the query vector - ONLY COSINE SIM
-    faiss.normalize_L2(query_vector)
+# Format one row of FAISS results (idx -1 means fewer than k results, a
+# removed chunk is skipped); texts are decoded only for the kept hits
+def format_hits(scores, indices, k=None):
+    kept = [(score, idx) for score, idx in zip(scores, indices)
+            if idx >= 0 and not dense_corpus.is_removed(idx)][:k]
+    texts = dense_corpus.get_many([idx for _, idx in kept])
+    return [{
+        "score": float(score),
+        "doc": text,
+        "meta": dense_metadata.meta(idx),
+        "method": "dense",
+        "id": int(idx)  # chunk id in the dense index
+    } for (score, idx), text in zip(kept, texts)]
+
+# Retrieve top-k similar chunks using dense retrieval.
+# filters: optional metadata filter, e.g. {"title": "Governing the Moon"}
+# (see metadata_filter.py); applied inside the FAISS search.
+def retrieve(query: str, k=5, filters=None):
+    return retrieve_batch([query], k, filters)[0]
+
+# Retrieve top-k chunks for many queries: one encode batch, one FAISS search
+def retrieve_batch(queries, k=5, filters=None):
+    load_dense_index()
+    if not queries:
+        return []
 
-    # Search index
-    scores, indices = faiss_index.search(query_vector, k)
+    query_vectors = encode_queries(list(queries))
 
-    # Format hits
-    hits = []
-    for score, idx in zip(scores[0], indices[0]):
-        hits.append({
-            "score": float(score),
-            "doc": dense_corpus[idx],
-            "meta": dense_metadata[idx],
-            "method": "dense"
-        })
+    selector = metadata_index.selector(filters)
+    if selector is not None:
+        # Only chunk ids in the filter's bitmap are scored (removed chunks never are)
+        params = index_types.search_parameters(faiss_index, index_params, selector)
+        scores, indices = faiss_index.search(query_vectors, k, params=params)
+    else:
+        # Search index (over-fetch past removed chunks the index still holds)
+        scores, indices = faiss_index.search(query_vectors, min(k + n_deleted, max(faiss_index.ntotal, k)))
 
-    return hits
+    return [format_hits(s, i, k) for s, i in zip(scores, indices)]
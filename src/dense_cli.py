@@ -1,15 +1,16 @@
 #!/usr/bin/env python
 """
 Lightweight CLI for local Q&A that:
- • retrieves top-k chunks (BM25+FAISS),
+ • retrieves top-k chunks (FAISS; hybrid_cli.py runs BM25+FAISS),
  • feeds them to Mistral with an *answer-only-if-supported* prompt,
  • prints answer + structured citations.
 """
 
 import os, re, textwrap, json
 from dense.retrieval import retrieve
+from dense.embedding import prewarm as prewarm_embeddings
 from load_mistral import load as load_llm
-from dense.dense_corpus_loader.build_index import build
+from dense.dense_corpus_loader.update_index import ensure_fresh
 
 # Import sklearn stopwords for query cleaning
 from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
@@ -60,18 +61,15 @@ def ensure_ready():
 
     print("\n🔍 Checking for existing data and indexes...")
 
-    faiss_path = os.path.join(INDEX_DIR, "dense_index.idx")
-
-    if not os.path.exists(faiss_path):
-        print("🔧 FAISS Index file not found. Building indexes...")
-        build()  # This calls load_all_data() internally
-        print("✅ All indexes built.\n")
-    else:
-        print("✅ Index files found. Skipping index building.\n")
+    # Builds, updates or keeps the index depending on what changed since it
+    # was built (see index_manifest.py)
+    ensure_fresh()
+    print("✅ Index files ready.\n")
 
 
 def main():
     ensure_ready()
+    prewarm_embeddings()  # embedding model loads in the background while the LLM loads
     llm = load_llm()
 
     print("🔸 Ask anything (type 'exit' to quit).")
@@ -0,0 +1,70 @@
+"""
+Benchmark MaxScore pruning against exhaustive BM25 scoring.
+Checks that both modes return identical hits and reports latency plus
+how many postings pruning skipped.
+
+Run from the repo root:  PYTHONPATH=src python src/eval/bench_bm25_pruning.py
+"""
+import json
+import time
+import argparse
+import numpy as np
+from sparse import retrieval_bm25
+
+# -----------------------------
+# Argument Parser
+# -----------------------------
+parser = argparse.ArgumentParser()
+parser.add_argument("--eval-file", default="src/eval/retrieve_bm25_eval_set.json")
+parser.add_argument("--top-k", type=int, default=5)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+# -----------------------------
+# Queries: short questions + long answer passages
+# -----------------------------
+with open(args.eval_file) as f:
+    eval_set = json.load(f)
+
+raw_queries = []
+for item in eval_set:
+    raw_queries.append(item["query"])
+    expected = item["expected"]
+    raw_queries.append(" ".join(expected) if isinstance(expected, list) else expected)
+
+retrieval_bm25.load_indexes()
+queries = [retrieval_bm25.analyze(q).split() for q in raw_queries]
+queries = [q for q in queries if q]
+
+index = retrieval_bm25.bm25
+print(f"📦 Index: {index.n_docs} chunks, {len(index.vocab)} terms, {len(index.doc_ids)} postings")
+print(f"🔍 {len(queries)} queries, top-{args.top_k}\n")
+
+# -----------------------------
+# Exactness check
+# -----------------------------
+for q in queries:
+    exact = index.search(q, args.top_k)
+    pruned = index.search(q, args.top_k, prune=True)
+    if not (np.array_equal(exact[0], pruned[0]) and np.array_equal(exact[1], pruned[1])):
+        raise SystemExit(f"❌ Pruned hits differ from exhaustive hits for query: {' '.join(q)}")
+print("✅ Pruned hits identical to exhaustive hits.\n")
+
+# -----------------------------
+# Timing + postings counters
+# -----------------------------
+for prune in (False, True):
+    stats = {}
+    for q in queries:
+        index.search(q, args.top_k, prune=prune, stats=stats)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for q in queries:
+            index.search(q, args.top_k, prune=prune)
+    per_query_ms = (time.perf_counter() - start) * 1000 / (args.repeat * len(queries))
+
+    skipped_pct = stats["skipped"] / stats["postings"] if stats["postings"] else 0.0
+    print(f"{'maxscore' if prune else 'exhaustive':>10}: {per_query_ms:7.3f} ms/query | "
+          f"postings {stats['postings']:>9} | scored {stats['scored']:>9} | "
+          f"skipped {stats['skipped']:>9} ({skipped_pct:.1%})")
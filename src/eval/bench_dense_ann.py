@@ -0,0 +1,109 @@
+"""
+Benchmark the ANN index types and storage modes against exact fp32 search.
+Rebuilds each index type x storage (fp32 / fp16 / sq8, optionally after
+PCA) from the vectors stored in the built index, sweeps the search-time knob
+(nprobe / efSearch / rescore_factor) and reports build time, index memory,
+latency and recall@k against flat ground truth. For the binary type the
+memory column counts the in-RAM codes only; its float vectors stay on disk.
+
+Run from the repo root:  PYTHONPATH=src python src/eval/bench_dense_ann.py
+"""
+import json
+import time
+import tempfile
+import argparse
+import numpy as np
+import faiss
+from dense import retrieval
+from dense import faiss_index
+from dense.binary_index import BinaryRescoreIndex
+
+# -----------------------------
+# Argument Parser
+# -----------------------------
+parser = argparse.ArgumentParser()
+parser.add_argument("--eval-file", default="src/eval/retrieve_faiss_eval_set.json")
+parser.add_argument("--top-k", type=int, default=10)
+parser.add_argument("--n-sample-queries", type=int, default=500, help="stored vectors reused as extra queries")
+parser.add_argument("--types", nargs="+", default=list(faiss_index.INDEX_TYPES), choices=faiss_index.INDEX_TYPES)
+parser.add_argument("--storages", nargs="+", default=list(faiss_index.STORAGE_TYPES), choices=faiss_index.STORAGE_TYPES)
+parser.add_argument("--pca-dims", nargs="+", type=int, default=[0], help="0 = no PCA")
+args = parser.parse_args()
+
+# -----------------------------
+# Vectors + queries
+# -----------------------------
+retrieval.load_dense_index()
+stored = retrieval.faiss_index
+built = faiss_index.load_params(retrieval.INDEX_DIR)
+if (built["index_type"], built["storage"], built["pca_dim"]) != ("flat", "fp32", None):
+    raise SystemExit("❌ Build the dense index as flat fp32 without PCA first; its vectors are the baseline.")
+flat = faiss_index.unwrap(stored)
+vectors = flat.reconstruct_n(0, flat.ntotal)
+id_map = getattr(faiss.downcast_index(stored), "id_map", None)
+ids = faiss.vector_to_array(id_map) if id_map is not None else np.arange(len(vectors), dtype=np.int64)
+
+with open(args.eval_file) as f:
+    eval_set = json.load(f)
+queries = retrieval.encode_queries([item["query"] for item in eval_set])
+
+rng = np.random.default_rng(0)
+sample = rng.choice(len(vectors), size=min(args.n_sample_queries, len(vectors)), replace=False)
+queries = np.vstack([queries, vectors[sample]])
+k = args.top_k
+
+def timed_search(index, queries):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall(found, truth):
+    return np.mean([len(set(a) & set(b)) / k for a, b in zip(found, truth)])
+
+def memory_mb(index):
+    if isinstance(index, BinaryRescoreIndex):
+        return len(faiss.serialize_index_binary(index.binary)) / 2**20
+    return len(faiss.serialize_index(index)) / 2**20
+
+truth, flat_ms = timed_search(stored, queries)
+print(f"📦 {len(vectors)} vectors (dim {vectors.shape[1]}), {len(queries)} queries, recall@{k}\n")
+print(f"{'flat':>9} | build      - | {memory_mb(stored):8.1f} MB | {flat_ms:7.3f} ms/query | recall 1.000")
+
+# -----------------------------
+# Index type x storage sweep
+# -----------------------------
+scratch_dir = tempfile.mkdtemp()  # binary type's float vectors
+train = vectors[rng.permutation(len(vectors))[:faiss_index.DEFAULT_PARAMS["train_size"]]]
+configs = [(t, s, p) for t in args.types for s in args.storages for p in args.pca_dims
+           if not (t == "ivf_pq" and s != "fp32")  # PQ has its own codes
+           and not (t == "binary" and (s == "sq8" or p))
+           and (t, s, p) != ("flat", "fp32", 0)]   # the baseline above
+
+for index_type, storage, pca_dim in configs:
+    params = faiss_index.resolve_params(index_type, {"storage": storage, "pca_dim": pca_dim or None},
+                                        n_train=len(train))
+
+    start = time.perf_counter()
+    index = faiss_index.make_index(vectors.shape[1], params, scratch_dir)
+    if not index.is_trained:
+        index.train(train)
+    index.add_with_ids(vectors, ids)
+    build_s = time.perf_counter() - start
+
+    if faiss_index.find_ivf(index) is not None:
+        knob, values = "nprobe", [v for v in (1, 4, 8, 16, 32, 64, 128) if v <= params["nlist"]]
+    elif isinstance(index, BinaryRescoreIndex):
+        knob, values = "rescore_factor", [1, 2, 5, 10, 20, 50]
+    elif faiss_index.find_hnsw(index) is not None:
+        knob, values = "ef_search", [16, 32, 64, 128, 256]
+    else:
+        knob, values = None, [None]
+
+    mb = memory_mb(index)
+    print(f"\n{faiss_index.factory_string(params)}")
+    for value in values:
+        if knob:
+            faiss_index.apply_search_params(index, {**params, knob: value})
+        found, ms = timed_search(index, queries)
+        print(f"{index_type:>9} | build {build_s:6.1f}s | {mb:8.1f} MB | {ms:7.3f} ms/query | "
+              f"recall {recall(found, truth):.3f}" + (f" | {knob}={value}" if knob else ""))
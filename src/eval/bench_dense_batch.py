@@ -0,0 +1,47 @@
+"""
+Time batched dense retrieval against the one-query-at-a-time loop.
+Checks that both paths return the same chunks.
+
+Run from the repo root:  PYTHONPATH=src python src/eval/bench_dense_batch.py
+"""
+import json
+import time
+import argparse
+from dense import retrieval
+
+# -----------------------------
+# Argument Parser
+# -----------------------------
+parser = argparse.ArgumentParser()
+parser.add_argument("--eval-file", default="src/eval/retrieve_faiss_eval_set.json")
+parser.add_argument("--top-k", type=int, default=5)
+parser.add_argument("--n-queries", type=int, default=200, help="eval queries are repeated up to this many")
+args = parser.parse_args()
+
+with open(args.eval_file) as f:
+    eval_set = json.load(f)
+
+base = [item["query"] for item in eval_set]
+queries = [base[i % len(base)] for i in range(args.n_queries)]
+
+# Time the encoder itself, not the query-embedding cache
+retrieval.USE_QUERY_CACHE = False
+
+# Warm up: load index + model once so neither path pays for it
+retrieval.retrieve_batch(queries[:2], args.top_k)
+
+start = time.perf_counter()
+looped = [retrieval.retrieve(q, args.top_k) for q in queries]
+looped_s = time.perf_counter() - start
+
+start = time.perf_counter()
+batched = retrieval.retrieve_batch(queries, args.top_k)
+batched_s = time.perf_counter() - start
+
+same = sum([h["doc"] for h in a] == [h["doc"] for h in b] for a, b in zip(looped, batched))
+
+print(f"🔍 {len(queries)} queries, top-{args.top_k}")
+print(f"   looped : {looped_s:.3f}s ({looped_s / len(queries) * 1000:.2f} ms/query)")
+print(f"   batched: {batched_s:.3f}s ({batched_s / len(queries) * 1000:.2f} ms/query)")
+print(f"   speedup: {looped_s / batched_s:.1f}x")
+print(f"   identical hit lists: {same}/{len(queries)}")
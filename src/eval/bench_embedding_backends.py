@@ -0,0 +1,63 @@
+"""
+Compare the embedding backends (torch / onnx / onnx-int8).
+Parity: cosine similarity of each backend's embeddings with the torch ones.
+Throughput: texts/sec encoding the same texts (corpus chunks + eval queries).
+
+Run from the repo root:  PYTHONPATH=src python src/eval/bench_embedding_backends.py
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+from dense.embedding import EMBEDDING_BACKENDS, load_model
+from text_store import TextStore
+
+# -----------------------------
+# Argument Parser
+# -----------------------------
+parser = argparse.ArgumentParser()
+parser.add_argument("--eval-file", default="src/eval/retrieve_faiss_eval_set.json")
+parser.add_argument("--corpus-dir", default=os.path.join("index", "dense_text"))
+parser.add_argument("--n-chunks", type=int, default=2000)
+parser.add_argument("--batch-size", type=int, default=64)
+parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+args = parser.parse_args()
+
+# -----------------------------
+# Texts: eval queries + a corpus sample
+# -----------------------------
+with open(args.eval_file) as f:
+    queries = [item["query"] for item in json.load(f)]
+
+chunks = []
+if TextStore.exists(args.corpus_dir):
+    corpus = TextStore.load(args.corpus_dir)
+    chunks = [t for t in corpus.get_many(range(min(args.n_chunks, len(corpus)))) if t is not None]
+
+texts = queries + chunks
+print(f"🔍 {len(queries)} queries + {len(chunks)} chunks, batch size {args.batch_size}\n")
+
+# -----------------------------
+# Encode with each backend
+# -----------------------------
+results = {}
+for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+    model = load_model(backend)
+    model.encode(texts[:args.batch_size], batch_size=args.batch_size)  # warm up
+
+    start = time.perf_counter()
+    embeddings = np.asarray(model.encode(texts, batch_size=args.batch_size), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+
+    embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    results[backend] = (embeddings, elapsed)
+
+# -----------------------------
+# Report
+# -----------------------------
+reference, torch_s = results["torch"]
+for backend, (embeddings, elapsed) in results.items():
+    cos = np.sum(embeddings * reference, axis=1)
+    print(f"{backend:>9}: {len(texts) / elapsed:8.1f} texts/s ({torch_s / elapsed:.2f}x torch) | "
+          f"cosine vs torch mean {cos.mean():.5f} min {cos.min():.5f}")
@@ -0,0 +1,52 @@
+"""
+Time hybrid retrieval (BM25 and FAISS in parallel threads) against each
+backend alone and against running both back to back.
+Concurrent wall-clock time should be close to the slower backend.
+
+Run from the repo root:  PYTHONPATH=src python src/eval/bench_hybrid.py
+"""
+import json
+import time
+import argparse
+from dense import retrieval as dense_retrieval
+from sparse import retrieval_bm25
+from hybrid import retrieval as hybrid
+
+# -----------------------------
+# Argument Parser
+# -----------------------------
+parser = argparse.ArgumentParser()
+parser.add_argument("--eval-file", default="src/eval/retrieve_faiss_eval_set.json")
+parser.add_argument("--top-k", type=int, default=5)
+parser.add_argument("--fusion", default=hybrid.FUSION, choices=hybrid.FUSION_METHODS)
+args = parser.parse_args()
+
+with open(args.eval_file) as f:
+    queries = [item["query"] for item in json.load(f)]
+
+# Time the encoder itself, not the query-embedding cache
+dense_retrieval.USE_QUERY_CACHE = False
+
+# Warm up: load both indexes + the model once so no path pays for it
+hybrid.load_indexes()
+hybrid.retrieve(queries[0], args.top_k, fusion=args.fusion)
+
+def timed(fn):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return time.perf_counter() - start
+
+fetch_k = max(hybrid.FETCH_K, args.top_k)
+dense_s = timed(lambda q: dense_retrieval.retrieve(q, fetch_k))
+sparse_s = timed(lambda q: retrieval_bm25.retrieve(hybrid.sparse_query(q), fetch_k))
+sequential_s = timed(lambda q: hybrid.fuse([dense_retrieval.retrieve(q, fetch_k),
+                                            retrieval_bm25.retrieve(hybrid.sparse_query(q), fetch_k)],
+                                           args.top_k, args.fusion))
+hybrid_s = timed(lambda q: hybrid.retrieve(q, args.top_k, fusion=args.fusion))
+
+print(f"🔍 {len(queries)} queries, top-{args.top_k} from {fetch_k} per backend, {args.fusion} fusion")
+for name, seconds in (("dense only", dense_s), ("bm25 only", sparse_s),
+                      ("sequential", sequential_s), ("concurrent", hybrid_s)):
+    print(f"   {name:<10}: {seconds:.3f}s ({seconds / len(queries) * 1000:.2f} ms/query)")
+print(f"   concurrent vs slower backend: {hybrid_s / max(dense_s, sparse_s):.2f}x")
@@ -0,0 +1,51 @@
+"""
+Compare first-stage retrieval alone against retrieve-then-rerank.
+Quality: fraction of eval queries with a top-k hit from the expected
+source PDF (title match). Latency: per-stage ms/query from the pipeline.
+
+Run from the repo root:  PYTHONPATH=src python src/eval/bench_rerank.py
+"""
+import json
+import time
+import argparse
+from rerank import pipeline
+
+# -----------------------------
+# Argument Parser
+# -----------------------------
+parser = argparse.ArgumentParser()
+parser.add_argument("--eval-file", default="src/eval/retrieve_faiss_eval_set.json")
+parser.add_argument("--top-k", type=int, default=5)
+parser.add_argument("--first-stages", nargs="+", default=list(pipeline.FIRST_STAGES), choices=pipeline.FIRST_STAGES)
+parser.add_argument("--candidates", type=int, nargs="+", default=[10, 30, 50])
+parser.add_argument("--budget-ms", type=float, default=None, help="rerank latency budget (default: none)")
+parser.add_argument("--cutoff", type=float, default=None)
+args = parser.parse_args()
+
+with open(args.eval_file) as f:
+    eval_set = json.load(f)
+queries = [item["query"] for item in eval_set]
+sources = [item.get("source_pdf", "").casefold() for item in eval_set]
+
+def source_hit_rate(results):
+    hits = sum(any(h["meta"].get("title", "").casefold() == src for h in hits)
+               for hits, src in zip(results, sources))
+    return hits / len(results)
+
+# Warm up: indexes, embedding model and cross-encoder
+pipeline.retrieve(queries[0], args.top_k, first_stage="hybrid", n_candidates=5, budget_ms=None)
+
+print(f"🔍 {len(queries)} queries, top-{args.top_k}")
+for first_stage in args.first_stages:
+    start = time.perf_counter()
+    baseline = [pipeline.first_stage_batch([q], args.top_k, first_stage)[0] for q in queries]
+    base_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"\n{first_stage:<7} first stage only      | source hit@{args.top_k} {source_hit_rate(baseline):.2%} | "
+          f"{base_ms:.1f} ms/query")
+
+    for n in args.candidates:
+        stats = {}
+        results = [pipeline.retrieve(q, args.top_k, first_stage, n_candidates=n, budget_ms=args.budget_ms,
+                                     cutoff=args.cutoff, stats=stats) for q in queries]
+        print(f"{first_stage:<7} + rerank {n:>3} candidates | source hit@{args.top_k} {source_hit_rate(results):.2%} | "
+              f"{pipeline.format_stats(stats)}")
@@ -2,8 +2,7 @@ import json
 import os
 import re
 from rapidfuzz import fuzz
-import spacy
-from sparse.retrieval_bm25 import retrieve  # or your BM25 retriever method
+from sparse.retrieval_bm25 import retrieve_batch, analyze  # batched BM25 retrieval
 
 # --- Config ---
 EVAL_FILE = "src/eval/retrieve_bm25_eval_set.json"
@@ -13,12 +12,9 @@ FUZZY_THRESHOLD = 0.5
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-# --- Load spaCy for lemmatization ---
-nlp = spacy.load("en_core_web_sm")
-
+# --- Lemmatize with the index's lemma table (same tokens as the indexed chunks) ---
 def lemmatize_text(text):
-    doc = nlp(text)
-    return " ".join(token.lemma_ for token in doc if token.is_alpha)
+    return analyze(text)
 
 # --- Helpers ---
 def fuzzy_or_containment_match(chunk, expected, threshold=FUZZY_THRESHOLD):
@@ -52,14 +48,14 @@ results = []
 
 print("🔍 Running Context Precision & Recall Evaluation...\n")
 
-for item in eval_set:
+# ✅ Fix 1: Lemmatize queries to match lemmatized chunks, then retrieve all at once
+lemmatized_queries = [lemmatize_text(item["query"]) for item in eval_set]
+all_hits = retrieve_batch(lemmatized_queries, k=TOP_K)
+
+for item, hits in zip(eval_set, all_hits):
     raw_query = item["query"]
     expected_list = item["expected"]
 
-    # ✅ Fix 1: Lemmatize query to match lemmatized chunks
-    lemmatized_query = lemmatize_text(raw_query)
-
-    hits = retrieve(lemmatized_query, k=TOP_K)
     retrieved_docs = [h["doc"] for h in hits]
 
     expected_text = " ".join(expected_list)
@@ -1,7 +1,8 @@
 import json
 import os
-from sentence_transformers import SentenceTransformer, util
-from src.dense.retrieval import retrieve
+from sentence_transformers import util
+from dense.retrieval import retrieve
+from dense.embedding import get_model
 import argparse
 
 # -----------------------------
@@ -24,7 +25,7 @@ TOP_K = args.top_k
 # Setup
 # -----------------------------
 os.makedirs(OUTPUT_DIR, exist_ok=True)
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+model = get_model()  # same instance retrieval encodes queries with
 
 # -----------------------------
 # Load Evaluation Set
@@ -0,0 +1,144 @@
+"""
+Hybrid retrieval: BM25 and FAISS run concurrently, then their ranked lists
+are fused.
+Each backend gets the query in the form it was indexed with (BM25: the
+lemmatized terms from the query analyzer, dense: the text as given) and
+runs in its own worker thread; the heavy parts (numpy scoring, FAISS
+search, the encoder) release the GIL, so wall-clock time is close to the
+slower backend rather than the sum of both.
+
+Fusion:
+  rrf    reciprocal rank fusion, sum of weight / (RRF_K + rank)
+  score  min-max normalized scores per backend, weighted sum
+Hits are merged by passage. Both indexes chunk the corpus the same way
+(see dense preprocess.py), so a passage is (source file, chunk_id) in
+either one: a passage found by both backends becomes one hit whose fused
+score sums both contributions (agreement ranks it up). Hits without a
+source fall back to (method, id).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dense import retrieval as dense_retrieval
+from sparse import retrieval_bm25
+
+FUSION_METHODS = ("rrf", "score")
+FUSION = "rrf"
+RRF_K = 60      # rank damping for RRF (the usual constant from the RRF paper)
+FETCH_K = 20    # candidates taken from each backend before fusion
+WEIGHTS = {"dense": 1.0, "bm25": 1.0}
+
+_pool = None
+
+# Two workers shared across calls: one per backend
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid")
+    return _pool
+
+# Load both indexes (in parallel) so the first query doesn't pay for it
+def load_indexes():
+    dense = get_pool().submit(dense_retrieval.load_dense_index)
+    sparse = get_pool().submit(retrieval_bm25.load_indexes)
+    dense.result()
+    sparse.result()
+
+# BM25 terms for a raw query (falls back to the query if analysis removes everything)
+def sparse_query(query):
+    return retrieval_bm25.analyze(query) or query
+
+# Query analysis runs in the BM25 worker too, overlapping the dense encode
+def _sparse_retrieve(query, k, filters):
+    return retrieval_bm25.retrieve(sparse_query(query), k, filters=filters)
+
+def _sparse_retrieve_batch(queries, k, filters):
+    return retrieval_bm25.retrieve_batch([sparse_query(q) for q in queries], k, filters=filters)
+
+def hit_key(hit):
+    return hit["method"], hit["id"]
+
+# Identity of the passage a hit points at, shared by both backends
+def passage_key(hit):
+    meta = hit.get("meta") or {}
+    source = meta.get("filename") or meta.get("title")
+    if source is None or meta.get("chunk_id", -1) < 0:
+        return hit_key(hit)
+    return source, meta["chunk_id"]
+
+# Fused score per passage key, given one ranked hit list per backend.
+# A backend counts each passage once (its best rank).
+def fuse_rrf(hit_lists, rrf_k=RRF_K, weights=None):
+    weights = weights or WEIGHTS
+    scores = {}
+    for hits in hit_lists:
+        seen = set()
+        for rank, hit in enumerate(hits, 1):
+            key = passage_key(hit)
+            if key in seen:
+                continue
+            seen.add(key)
+            scores[key] = scores.get(key, 0.0) + weights.get(hit["method"], 1.0) / (rrf_k + rank)
+    return scores
+
+def fuse_scores(hit_lists, weights=None):
+    weights = weights or WEIGHTS
+    scores = {}
+    for hits in hit_lists:
+        if not hits:
+            continue
+        raw = [hit["score"] for hit in hits]
+        lo, hi = min(raw), max(raw)
+        seen = set()
+        for hit in hits:
+            key = passage_key(hit)
+            if key in seen:
+                continue
+            seen.add(key)
+            # A list whose scores are all equal counts every hit as a full match
+            norm = (hit["score"] - lo) / (hi - lo) if hi > lo else 1.0
+            scores[key] = scores.get(key, 0.0) + weights.get(hit["method"], 1.0) * norm
+    return scores
+
+def fuse(hit_lists, k=5, fusion=FUSION, weights=None):
+    """
+    Merge per-backend hit lists into the top-k hybrid hits. Each hit keeps
+    the fields of the first backend that found its passage (list order);
+    "score" becomes the fused score, that backend's own score moves to
+    "backend_score", and "methods" lists every backend that found it.
+    """
+    if fusion not in FUSION_METHODS:
+        raise ValueError(f"Invalid fusion '{fusion}'. Choose one of {FUSION_METHODS}.")
+    scores = fuse_rrf(hit_lists, weights=weights) if fusion == "rrf" else fuse_scores(hit_lists, weights)
+
+    # First occurrence of each passage wins (dedupe)
+    by_key, methods = {}, {}
+    for hits in hit_lists:
+        for hit in hits:
+            key = passage_key(hit)
+            by_key.setdefault(key, hit)
+            found_by = methods.setdefault(key, [])
+            if hit["method"] not in found_by:
+                found_by.append(hit["method"])
+
+    ranked = sorted(by_key, key=lambda key: -scores[key])[:k]
+    return [{**by_key[key], "score": scores[key], "backend_score": by_key[key]["score"],
+             "methods": methods[key]} for key in ranked]
+
+# Top-k hybrid retrieval for one raw question.
+# filters: optional metadata filter (see metadata_filter.py), applied in both backends
+def retrieve(query: str, k=5, filters=None, fusion=FUSION, fetch_k=FETCH_K):
+    fetch_k = max(fetch_k, k)
+    pool = get_pool()
+    dense = pool.submit(dense_retrieval.retrieve, query, fetch_k, filters)
+    sparse = pool.submit(_sparse_retrieve, query, fetch_k, filters)
+    return fuse([dense.result(), sparse.result()], k, fusion)
+
+# Top-k hybrid retrieval for many questions: one batched call per backend
+def retrieve_batch(queries, k=5, filters=None, fusion=FUSION, fetch_k=FETCH_K):
+    queries = list(queries)
+    if not queries:
+        return []
+    fetch_k = max(fetch_k, k)
+    pool = get_pool()
+    dense = pool.submit(dense_retrieval.retrieve_batch, queries, fetch_k, filters)
+    sparse = pool.submit(_sparse_retrieve_batch, queries, fetch_k, filters)
+    return [fuse([d, s], k, fusion) for d, s in zip(dense.result(), sparse.result())]
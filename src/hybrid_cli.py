@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Lightweight CLI for local Q&A that:
+ • retrieves top-k chunks (BM25+FAISS, run concurrently and rank-fused),
+ • reranks a few dozen candidates with a cross-encoder (rerank/pipeline.py),
+ • feeds them to Mistral with an *answer-only-if-supported* prompt,
+ • prints answer + structured citations.
+"""
+
+import os, re, textwrap, json
+from hybrid.retrieval import retrieve, load_indexes
+from rerank import pipeline as rerank
+from dense.embedding import prewarm as prewarm_embeddings
+from rerank.cross_encoder import prewarm as prewarm_reranker
+from load_mistral import load as load_llm
+from dense.dense_corpus_loader.update_index import ensure_fresh as ensure_dense
+from sparse.sparse_corpus_loader.build_index_bm25 import ensure_fresh as ensure_sparse
+
+# Constants
+K             = 5  #this is the max to not run out of tokens in mistral....
+RERANK        = True  # first stage fetches rerank.N_CANDIDATES, cross-encoder keeps K
+MAX_GEN_TOK   = 512
+STOP_TOKENS   = ["</s>", "###", "Answer:"]
+DATA_DIR      = "data"
+INDEX_DIR     = "index"
+
+PROMPT_TMPL = """<|system|>
+You are an expert assistant. Rely *only* on the provided context.
+If the answer is not contained in it, reply exactly: "I don’t know.".
+When you answer, append a line "Sources:" listing each cited chunk id.
+<|user|>
+Question: {question}
+
+Context:
+{context}
+<|assistant|>
+Answer:
+"""
+
+def format_context(hits):
+    lines = []
+    for i, h in enumerate(hits, 1):
+        meta = json.dumps(h["meta"], ensure_ascii=False)
+        lines.append(f"[{i}] {h['doc']}\nMETA: {meta}\n")
+    return "\n".join(lines)
+
+def ensure_ready():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(INDEX_DIR, exist_ok=True)
+
+    print("\n🔍 Checking for existing data and indexes...")
+
+    # Each index is checked against its own build manifest (see index_manifest.py)
+    ensure_dense()
+    ensure_sparse()
+    print("✅ Index files ready.\n")
+
+
+def main():
+    ensure_ready()
+    prewarm_embeddings()  # embedding model loads in the background while the LLM loads
+    if RERANK:
+        prewarm_reranker()
+    load_indexes()
+    llm = load_llm()
+
+    print("🔸 Ask anything (type 'exit' to quit).")
+    while True:
+        q = input("\n❓ ").strip()
+        if q.lower() == "exit":
+            print("👋 Goodbye!")
+            break
+        if not re.search(r"\w", q):
+            continue
+
+        # Each backend analyzes the raw question its own way (see hybrid/retrieval.py)
+        if RERANK:
+            stats = {}
+            hits = rerank.retrieve(q, K, stats=stats)
+            print(f"⏱️ {rerank.format_stats(stats)}")
+        else:
+            hits = retrieve(q, K)
+        ctx = format_context(hits)
+        prompt = PROMPT_TMPL.format(question=q, context=ctx)
+
+        out = llm(
+            prompt,
+            max_tokens=MAX_GEN_TOK,
+            temperature=0.2,
+            top_p=0.8,
+            stop=STOP_TOKENS
+        )["choices"][0]["text"].strip()
+
+        print("\n🧠", textwrap.fill(out, 100))
+
+        cited_ids = set(map(int, re.findall(r"\[(\d+)\]", out)))
+
+        if cited_ids:
+            print("\n📚 Cited sources:")
+            for idx, h in enumerate(hits, 1):
+                if idx in cited_ids:
+                    doc_snippet = h["doc"].strip().replace("\n", " ")
+                    if len(doc_snippet) > 200:
+                        doc_snippet = doc_snippet[:400].rstrip() + "..."
+                    title = h["meta"].get("title", "?")
+                    print(f"Title: {title} ({h['method']}) - \"{doc_snippet}\" ")
+        else:
+            print("\n📚 No specific sources cited.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Build manifests: what an index was built from, so startup can tell whether
+it is still fresh without reading the corpus.
+index/<name>_manifest.json is written after the index itself and records
+  config   everything that shapes the index content: extractor version,
+           preprocessing (chunk size, overlap, strategy), embedding model
+  index    how the index was built (type, storage, ...); reused on rebuild
+  sources  per source file (PDFs + their metadata.json): size, mtime_ns, sha256
+check() compares the current inputs against it:
+  - stat fast path: a file whose size and mtime_ns match is not read
+  - otherwise it is hashed; an unchanged hash only refreshes the stat,
+    which refresh() saves on "skip" so the file is not hashed again
+and returns a Plan: "skip", "update" (files added / removed / changed) or
+"rebuild" (no manifest, changed config, or changed document metadata).
+An index without a manifest (old build, or a build that never finished)
+is never trusted.
+"""
+import os
+import json
+from collections import namedtuple
+from corpus_preloader.extract_cache import file_hash
+from corpus_preloader.load_all_data import PDF_DIR
+from corpus_preloader.load_pdfs import METADATA_FILE
+from corpus_preloader.static_download_pdfs import download_selected_pdfs
+
+MANIFEST_VERSION = 1
+
+# refreshed: unchanged files whose stat moved (saved on skip, see refresh())
+Plan = namedtuple("Plan", "action reason added removed changed sources refreshed")
+
+def manifest_path(index_dir, name):
+    return os.path.join(index_dir, f"{name}_manifest.json")
+
+# Source files an index is built from: every PDF plus the metadata that titles them
+def source_files(pdf_dir=PDF_DIR, metadata_file=METADATA_FILE):
+    paths = []
+    if os.path.isdir(pdf_dir):
+        paths = [os.path.join(pdf_dir, f) for f in sorted(os.listdir(pdf_dir)) if f.endswith(".pdf")]
+    if os.path.exists(metadata_file):
+        paths.append(metadata_file)
+    return paths
+
+# Sources for a build: the corpus is fetched first (that adds PDFs and
+# updates metadata.json), then fingerprinted before the builder reads it,
+# so a file edited during the build shows up as changed on the next check
+def build_sources():
+    download_selected_pdfs()
+    return scan(source_files())
+
+def scan(paths, previous=None):
+    """
+    size / mtime_ns / sha256 per path. Entries of `previous` whose stat
+    still matches are reused as they are, so only touched files are read.
+    """
+    previous = previous or {}
+    entries = {}
+    for path in paths:
+        st = os.stat(path)
+        entry = previous.get(path)
+        if entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+            entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": file_hash(path)}
+        entries[path] = entry
+    return entries
+
+def load(index_dir, name):
+    path = manifest_path(index_dir, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except ValueError:
+        return None  # unreadable: treated like a missing manifest
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+# Written last by builders (temp file, then rename): it marks the index complete
+def save(index_dir, name, config, index, sources):
+    path = manifest_path(index_dir, name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "config": config, "index": index, "sources": sources}, f, indent=2)
+    os.replace(tmp_path, path)
+
+# On "skip", save the stats of files that were touched but not changed, so
+# they are not hashed again on the next check
+def refresh(index_dir, name, plan):
+    if plan.action == "skip" and plan.refreshed:
+        manifest = load(index_dir, name)
+        save(index_dir, name, manifest["config"], manifest["index"], plan.sources)
+
+# Drop the manifest before touching an index, so a rebuild that dies midway
+# is detected (no manifest) instead of served
+def invalidate(index_dir, name):
+    path = manifest_path(index_dir, name)
+    if os.path.exists(path):
+        os.remove(path)
+
+def check(index_dir, name, config, index_exists, paths=None):
+    """
+    Compare the manifest with the current config and source files.
+    `index_exists`: whether the index files themselves are present.
+    """
+    paths = source_files() if paths is None else paths
+    manifest = load(index_dir, name) if index_exists else None
+    if manifest is None:
+        reason = "no manifest" if index_exists else "no index"
+        return Plan("rebuild", reason, [], [], [], None, [])
+    if manifest["config"] != config:
+        changed = sorted(k for k in set(config) | set(manifest["config"])
+                         if config.get(k) != manifest["config"].get(k))
+        return Plan("rebuild", f"config changed ({', '.join(changed)})", [], [], [], None, [])
+
+    before = manifest["sources"]
+    sources = scan(paths, before)
+    added = [p for p in sources if p not in before]
+    removed = [p for p in before if p not in sources]
+    changed = [p for p in sources if p in before and sources[p]["sha256"] != before[p]["sha256"]]
+    # scan() reuses the old entry when the stat matches, so a new one that
+    # hashes the same was only touched
+    refreshed = [p for p in sources if p in before and sources[p] is not before[p] and p not in changed]
+
+    if METADATA_FILE in added + removed + changed:
+        return Plan("rebuild", "document metadata changed", added, removed, changed, sources, refreshed)
+    if added or removed or changed:
+        return Plan("update", f"{len(added)} added, {len(removed)} removed, {len(changed)} changed",
+                    added, removed, changed, sources, refreshed)
+    return Plan("skip", "up to date", [], [], [], sources, refreshed)
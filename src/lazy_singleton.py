@@ -0,0 +1,26 @@
+"""
+Process-wide object loaded on first use, e.g. the embedding model and the
+rerank cross-encoder. get() loads it once; prewarm() starts loading it in a
+background thread while something else (e.g. the LLM) is loading.
+"""
+import threading
+
+
+class LazySingleton:
+    def __init__(self, load):
+        self.load = load
+        self.instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.instance is None:
+            with self._lock:  # prewarm thread and first caller must not load it twice
+                if self.instance is None:
+                    self.instance = self.load()
+        return self.instance
+
+    # Start loading in a daemon thread; get() waits on the same lock
+    def prewarm(self):
+        thread = threading.Thread(target=self.get, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,111 @@
+"""
+Metadata filters shared by dense and sparse retrieval.
+A filter is a dict; fields are ANDed, list values are ORed:
+    {"title": "Governing the Moon"}
+    {"source": ["NASA", "ESA"], "pages": (10, 40)}
+    {"doc_id": [3, 7]}
+title / source / filename match case-insensitively against a chunk-id
+bitmap precomputed per value; doc_id and pages (chunks overlapping the
+inclusive range) are vectorized over per-chunk arrays. The result is a
+packed bitmap that FAISS takes as an IDSelectorBitmap and a boolean mask
+BM25 scoring takes directly, so filtering happens inside the search.
+"""
+import numpy as np
+
+VALUE_FIELDS = ("title", "source", "filename")
+FIELDS = VALUE_FIELDS + ("doc_id", "pages")
+
+def _key(value):
+    return str(value).casefold()
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+class MetadataIndex:
+    def __init__(self, n, bitmaps, doc_ids, page_start, page_end):
+        self.n = n
+        self.bitmaps = bitmaps  # field -> value key -> packed chunk bitmap
+        self.doc_ids = doc_ids
+        self.page_start = page_start
+        self.page_end = page_end
+
+    # Precompute from a columnar MetadataStore: values live in the document
+    # table, so chunks are grouped by their document's value code
+    # (removed chunks and documents match nothing)
+    @classmethod
+    def from_store(cls, store):
+        n = len(store)
+        doc_ids = np.asarray(store.doc_ids, dtype=np.int64)
+        live = np.flatnonzero(doc_ids >= 0)
+
+        bitmaps = {}
+        for field in VALUE_FIELDS:
+            codes = {}
+            doc_codes = np.array([-1 if doc is None or doc.get(field) is None
+                                  else codes.setdefault(_key(doc[field]), len(codes))
+                                  for doc in store.documents], dtype=np.int64)
+            chunk_codes = doc_codes[doc_ids[live]]
+            order = np.argsort(chunk_codes, kind="stable")
+            bounds = np.searchsorted(chunk_codes[order], np.arange(len(codes) + 1))
+            bitmaps[field] = {value: cls._pack(live[order[bounds[c]:bounds[c + 1]]], n)
+                              for value, c in codes.items()}
+
+        return cls(n, bitmaps, doc_ids, np.asarray(store.page_start), np.asarray(store.page_end))
+
+    @staticmethod
+    def _pack(ids, n):
+        mask = np.zeros(n, dtype=bool)
+        mask[ids] = True
+        return np.packbits(mask, bitorder="little")  # FAISS IDSelectorBitmap bit order
+
+    def values(self, field):
+        return sorted(self.bitmaps[field])
+
+    def bitmap(self, filters):
+        """
+        Packed bitmap of chunk ids matching `filters` (bit i of byte i >> 3,
+        little-endian), or None when there is nothing to filter on.
+        """
+        if not filters:
+            return None
+        unknown = set(filters) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown filter field(s) {sorted(unknown)}. Choose from {FIELDS}.")
+
+        result = np.full((self.n + 7) // 8, 0xFF, dtype=np.uint8)
+        for field, value in filters.items():
+            if field in VALUE_FIELDS:
+                part = np.zeros_like(result)
+                for v in _as_list(value):
+                    bits = self.bitmaps[field].get(_key(v))
+                    if bits is not None:
+                        part |= bits
+            elif field == "doc_id":
+                part = np.packbits(np.isin(self.doc_ids, _as_list(value)), bitorder="little")
+            else:
+                lo, hi = value
+                # Chunks without page spans can't be placed in a range
+                overlap = (self.page_start >= 0) & (self.page_start <= hi) & (self.page_end >= lo)
+                part = np.packbits(overlap, bitorder="little")
+            result &= part
+        return result
+
+    # Boolean per-chunk mask (None = no filter)
+    def mask(self, filters):
+        bits = self.bitmap(filters)
+        if bits is None:
+            return None
+        return np.unpackbits(bits, count=self.n, bitorder="little").astype(bool)
+
+    # FAISS selector over chunk ids (None = no filter)
+    def selector(self, filters):
+        import faiss
+
+        bits = self.bitmap(filters)
+        if bits is None:
+            return None
+        # n is the bitmap length in bytes, not the number of chunks
+        selector = faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits))
+        selector.referenced_objects = [bits]  # keep the bitmap alive with the selector
+        return selector
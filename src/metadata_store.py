@@ -0,0 +1,194 @@
+"""
+Columnar chunk metadata shared by dense and sparse retrieval.
+Instead of one JSON dict per chunk carrying a copy of its document's title,
+description, url and filepath, a store keeps:
+  - one int32 array per chunk field (doc_id, chunk_id, token/word count,
+    page_start, page_end; -1 = none), memory-mapped on load
+  - one document table (source metadata without page offsets, null for
+    removed documents) in documents.json, written last: it marks the store
+    complete and records how many chunk rows are valid
+A chunk's metadata dict is assembled on demand with meta(i), so retrieval
+builds dicts only for the hits it returns. Removed chunks have doc_id -1.
+"""
+import os
+import json
+from array import array
+import numpy as np
+from text_store import save_array
+
+FORMAT_VERSION = 1
+COLUMNS = ["doc_id", "chunk_id", "count", "page_start", "page_end"]
+DOCUMENTS_FILE = "documents.json"
+
+# Per-page offsets stay with the raw document, not in the table
+def document_meta(meta):
+    return {k: v for k, v in meta.items() if k != "page_offsets"}
+
+
+class MetadataStore:
+    def __init__(self, columns, documents, count_field="tokens"):
+        self.columns = columns  # name -> int32 array, one entry per chunk
+        self.documents = documents
+        self.count_field = count_field  # "tokens" (dense) or "words" (BM25)
+
+    def __len__(self):
+        return len(self.columns["doc_id"])
+
+    @property
+    def doc_ids(self):
+        return self.columns["doc_id"]
+
+    @property
+    def page_start(self):
+        return self.columns["page_start"]
+
+    @property
+    def page_end(self):
+        return self.columns["page_end"]
+
+    # Metadata dict for one chunk (same shape the JSON files used to hold),
+    # or None for a removed chunk
+    def meta(self, i):
+        doc_id = int(self.columns["doc_id"][i])
+        if doc_id < 0:
+            return None
+        meta = {
+            "doc_id": doc_id,
+            "chunk_id": int(self.columns["chunk_id"][i]),
+            self.count_field: int(self.columns["count"][i]),
+            **self.documents[doc_id],
+        }
+        if self.columns["page_start"][i] >= 0:
+            meta["page_start"] = int(self.columns["page_start"][i])
+            meta["page_end"] = int(self.columns["page_end"][i])
+        return meta
+
+    # Chunk ids of the given documents that are still live
+    def chunks_of(self, doc_ids):
+        return np.flatnonzero(np.isin(self.doc_ids, list(doc_ids)) & (self.doc_ids >= 0))
+
+    # Copy with the given chunks and documents marked removed (ids unchanged)
+    def tombstone(self, chunk_ids, doc_ids=()):
+        columns = {name: np.array(values) for name, values in self.columns.items()}
+        for name in ("doc_id", "page_start", "page_end"):
+            columns[name][np.asarray(chunk_ids, dtype=np.int64)] = -1
+        doc_ids = set(doc_ids)
+        documents = [None if i in doc_ids else doc for i, doc in enumerate(self.documents)]
+        return MetadataStore(columns, documents, self.count_field)
+
+    # Convert per-chunk dicts (the old <name>_metadata.json layout); documents
+    # are recovered from the first chunk of each doc_id
+    @classmethod
+    def from_dicts(cls, metadata, count_field="tokens"):
+        columns = {name: np.full(len(metadata), -1, dtype=np.int32) for name in COLUMNS}
+        documents = {}
+        chunk_fields = {"doc_id", "chunk_id", count_field, "page_start", "page_end"}
+        for i, meta in enumerate(metadata):
+            if meta is None:
+                continue
+            doc_id = meta["doc_id"]
+            columns["doc_id"][i] = doc_id
+            columns["chunk_id"][i] = meta.get("chunk_id", -1)
+            columns["count"][i] = meta.get(count_field, -1)
+            columns["page_start"][i] = meta.get("page_start", -1)
+            columns["page_end"][i] = meta.get("page_end", -1)
+            if doc_id not in documents:
+                documents[doc_id] = {k: v for k, v in meta.items() if k not in chunk_fields}
+        n_docs = max(documents, default=-1) + 1
+        return cls(columns, [documents.get(i) for i in range(n_docs)], count_field)
+
+    # Arrays first, documents.json last (it marks the store complete)
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in COLUMNS:
+            save_array(os.path.join(path, name), np.asarray(self.columns[name], dtype=np.int32))
+
+        tmp_path = os.path.join(path, DOCUMENTS_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "count_field": self.count_field,
+                "n_chunks": len(self),
+                "documents": self.documents,
+            }, f)
+        os.replace(tmp_path, os.path.join(path, DOCUMENTS_FILE))
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, DOCUMENTS_FILE))
+
+    # Open a saved store; chunk arrays are memory-mapped read-only unless mmap=False
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, DOCUMENTS_FILE), "r") as f:
+            header = json.load(f)
+        if header.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported metadata store format in {path}; rebuild the index.")
+
+        mode = "r" if mmap else None
+        n = header["n_chunks"]
+        # Rows past n_chunks are from an append that never completed
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)[:n] for name in COLUMNS}
+        return cls(columns, header["documents"], header["count_field"])
+
+    # Open the store at path, converting a legacy per-chunk JSON file once if
+    # that is all an older build left behind
+    @classmethod
+    def load_or_migrate(cls, path, legacy_json, count_field="tokens"):
+        if not cls.exists(path) and os.path.exists(legacy_json):
+            print(f"🔄 Converting {os.path.basename(legacy_json)} to a columnar metadata store...")
+            with open(legacy_json, "r") as f:
+                cls.from_dicts(json.load(f), count_field).save(path)
+        return cls.load(path)
+
+
+class MetadataStoreWriter:
+    """
+    Streams documents and chunks into a store: per-chunk fields go into
+    compact int arrays, each document's metadata is kept once. With
+    append=True, rows are added after those of the existing store.
+    Saved on a clean close.
+    """
+
+    def __init__(self, path, count_field="tokens", append=False):
+        self.path = path
+        self.count_field = count_field
+        self.columns = {name: array("i") for name in COLUMNS}
+        self.documents = []
+        if append:
+            store = MetadataStore.load(path, mmap=False)
+            self.count_field = store.count_field
+            for name in COLUMNS:
+                self.columns[name].frombytes(np.ascontiguousarray(store.columns[name], dtype=np.int32).tobytes())
+            self.documents = list(store.documents)
+
+    @property
+    def n_chunks(self):
+        return len(self.columns["doc_id"])
+
+    @property
+    def n_documents(self):
+        return len(self.documents)
+
+    def __enter__(self):
+        return self
+
+    # Documents get consecutive doc_ids in write order
+    def write_document(self, meta):
+        self.documents.append(document_meta(meta))
+
+    def write_chunk(self, meta):
+        self.columns["doc_id"].append(meta["doc_id"])
+        self.columns["chunk_id"].append(meta.get("chunk_id", -1))
+        self.columns["count"].append(meta.get(self.count_field, -1))
+        self.columns["page_start"].append(meta.get("page_start", -1))
+        self.columns["page_end"].append(meta.get("page_end", -1))
+
+    def close(self):
+        columns = {name: np.frombuffer(values, dtype=np.int32) for name, values in self.columns.items()}
+        MetadataStore(columns, self.documents, self.count_field).save(self.path)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
@@ -0,0 +1,34 @@
+"""
+Process-wide cross-encoder for the rerank stage (see rerank/pipeline.py).
+Like the embedding model, it is loaded on first use and can be prewarmed
+in a background thread; it runs on CPU.
+"""
+import os
+from lazy_singleton import LazySingleton
+import numpy as np
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Query + passage WordPiece tokens per pair, the model's full context: chunks
+# are up to CHUNK_TOKENS (300) cl100k tokens, which is more in WordPiece, so
+# a smaller limit would cut the end of most passages
+MAX_LENGTH = 512
+
+def load_model(model_name=RERANK_MODEL):
+    print(f"🤖 Loading rerank model: {model_name}")
+    from sentence_transformers import CrossEncoder  # heavy import, deferred
+    return CrossEncoder(model_name, max_length=MAX_LENGTH, device="cpu")
+
+_model = LazySingleton(lambda: load_model())
+
+def get_model():
+    return _model.get()
+
+def prewarm():
+    return _model.prewarm()
+
+# Relevance score per (query, passage) pair, all pairs in one batched forward pass
+def score(pairs):
+    if not pairs:
+        return np.zeros(0, dtype=np.float32)
+    return np.asarray(get_model().predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+                      dtype=np.float32)
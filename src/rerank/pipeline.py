@@ -0,0 +1,112 @@
+"""
+Retrieve-then-rerank cascade.
+A cheap first stage (dense ANN, BM25 with pruning, or hybrid) returns
+N_CANDIDATES chunks; a CPU cross-encoder rescores them in one batched
+forward pass and the best k are returned. It reads each hit's "doc", the
+readable chunk text for every backend (BM25 stores it next to its
+lemmatized terms). The rerank stage is bounded by:
+  budget_ms  pairs scored per query are capped at what fits the budget,
+             from the measured cost per pair (moving average; the first
+             call scores everything and calibrates)
+  cutoff     early cutoff: candidates whose first-stage score is below
+             cutoff * the top first-stage score are not reranked (None = off)
+Candidates left out by either rank after the reranked ones, in first-stage
+order. Hits keep their first-stage "score" and gain "rerank_score" (None
+when not reranked). Pass a `stats` dict to accumulate per-stage timings
+(ms) and candidate counts for tuning.
+"""
+import time
+from dense import retrieval as dense_retrieval
+from sparse import retrieval_bm25
+from hybrid import retrieval as hybrid
+from rerank import cross_encoder
+
+FIRST_STAGES = ("dense", "bm25", "hybrid")
+FIRST_STAGE = "hybrid"
+N_CANDIDATES = 30
+BUDGET_MS = 200.0
+CUTOFF = None
+EMA = 0.2  # weight of the newest measurement in the cost-per-pair average
+
+_ms_per_pair = None
+
+def _add(stats, **values):
+    if stats is not None:
+        for name, value in values.items():
+            stats[name] = stats.get(name, 0) + value
+
+def _ms_since(start):
+    return (time.perf_counter() - start) * 1000
+
+def first_stage_batch(queries, n, first_stage=FIRST_STAGE, filters=None):
+    if first_stage not in FIRST_STAGES:
+        raise ValueError(f"Invalid first stage '{first_stage}'. Choose one of {FIRST_STAGES}.")
+    if first_stage == "dense":
+        return dense_retrieval.retrieve_batch(queries, n, filters)
+    if first_stage == "bm25":
+        return retrieval_bm25.retrieve_batch([hybrid.sparse_query(q) for q in queries], n, filters)
+    return hybrid.retrieve_batch(queries, n, filters)
+
+# Candidates of one query that go through the cross-encoder
+def select_for_rerank(hits, k, budget_ms=BUDGET_MS, cutoff=CUTOFF):
+    n = len(hits)
+    if cutoff is not None and hits and hits[0]["score"] > 0:
+        floor = cutoff * hits[0]["score"]
+        n = max(min(k, n), sum(hit["score"] >= floor for hit in hits))
+    if budget_ms is not None and _ms_per_pair:
+        n = min(n, max(min(k, n), int(budget_ms / _ms_per_pair)))
+    return n
+
+def rerank_batch(queries, candidate_lists, k=5, budget_ms=BUDGET_MS, cutoff=CUTOFF, stats=None):
+    """
+    Rerank each query's candidates with the cross-encoder (one forward pass
+    over every selected pair of every query) and return the top-k per query.
+    """
+    global _ms_per_pair
+    n_rerank = [select_for_rerank(hits, k, budget_ms, cutoff) for hits in candidate_lists]
+    pairs = [(q, hit["doc"]) for q, hits, n in zip(queries, candidate_lists, n_rerank) for hit in hits[:n]]
+
+    start = time.perf_counter()
+    scores = cross_encoder.score(pairs)
+    elapsed = _ms_since(start)
+    if pairs:
+        cost = elapsed / len(pairs)
+        _ms_per_pair = cost if _ms_per_pair is None else (1 - EMA) * _ms_per_pair + EMA * cost
+    _add(stats, rerank_ms=elapsed, candidates=sum(map(len, candidate_lists)), reranked=len(pairs))
+
+    results, offset = [], 0
+    for hits, n in zip(candidate_lists, n_rerank):
+        reranked = [{**hit, "rerank_score": float(s)} for hit, s in zip(hits[:n], scores[offset:offset + n])]
+        reranked.sort(key=lambda hit: -hit["rerank_score"])
+        rest = [{**hit, "rerank_score": None} for hit in hits[n:]]
+        results.append((reranked + rest)[:k])
+        offset += n
+    return results
+
+# Top-k chunks for many queries: one batched first stage, one rerank pass
+def retrieve_batch(queries, k=5, first_stage=FIRST_STAGE, n_candidates=N_CANDIDATES,
+                   budget_ms=BUDGET_MS, cutoff=CUTOFF, filters=None, stats=None):
+    queries = list(queries)
+    if not queries:
+        return []
+    start = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    candidates = first_stage_batch(queries, max(n_candidates, k), first_stage, filters)
+    _add(stats, first_stage_ms=_ms_since(stage_start))
+
+    results = rerank_batch(queries, candidates, k, budget_ms, cutoff, stats)
+    _add(stats, total_ms=_ms_since(start), queries=len(queries))
+    return results
+
+def retrieve(query: str, k=5, first_stage=FIRST_STAGE, n_candidates=N_CANDIDATES,
+             budget_ms=BUDGET_MS, cutoff=CUTOFF, filters=None, stats=None):
+    return retrieve_batch([query], k, first_stage, n_candidates, budget_ms, cutoff, filters, stats)[0]
+
+# Mean per-query timings from an accumulated stats dict
+def format_stats(stats):
+    n = max(stats.get("queries", 0), 1)
+    return (f"first stage {stats.get('first_stage_ms', 0) / n:.1f} ms | "
+            f"rerank {stats.get('rerank_ms', 0) / n:.1f} ms "
+            f"({stats.get('reranked', 0) / n:.0f}/{stats.get('candidates', 0) / n:.0f} candidates) | "
+            f"total {stats.get('total_ms', 0) / n:.1f} ms")
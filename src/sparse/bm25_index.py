@@ -0,0 +1,367 @@
+"""
+Inverted-index BM25 (Okapi) engine for sparse retrieval.
+Keeps a term -> postings index plus precomputed IDF and doc-length norms,
+so a query only touches the postings of its own terms instead of every chunk.
+Scores follow rank_bm25.BM25Okapi (same k1, b and epsilon IDF floor).
+
+On disk the index is a directory of flat numpy arrays opened with np.memmap,
+so loading is near-instant, only the pages a query touches become resident,
+and processes on the same host share one copy through the page cache.
+"""
+
+import os
+import json
+import math
+import bisect
+from collections import Counter
+import numpy as np
+import scipy.sparse as sp
+
+# Okapi defaults (same as rank_bm25.BM25Okapi)
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+# On-disk layout: one .npy file per array + params.json (written last)
+FORMAT_VERSION = 2
+ARRAYS = ["vocab_blob", "vocab_offsets", "offsets", "doc_ids", "tfs", "doc_len", "idf", "norm", "max_scores"]
+PARAMS_FILE = "params.json"
+
+# Upper bounds are inflated by a hair so float rounding can never prune a real hit
+BOUND_SLACK = 1 + 1e-9
+
+
+def _count(stats, **counters):
+    for name, value in counters.items():
+        stats[name] = stats.get(name, 0) + int(value)
+
+
+# k-th largest value, or -inf while fewer than k values exist
+def kth_largest(values, k):
+    if len(values) < k:
+        return -np.inf
+    return np.partition(values, len(values) - k)[len(values) - k]
+
+
+# Select the k best (doc, score) pairs without sorting everything.
+# Ties are broken by doc id so results are deterministic. Docs scoring
+# exactly 0 (only idf-0 terms matched, df == n/2) are not hits: the sparse
+# product in search_batch() drops zero sums, so search() drops them too.
+def top_k(doc_ids, scores, k):
+    nonzero = scores != 0
+    if not nonzero.all():
+        doc_ids, scores = doc_ids[nonzero], scores[nonzero]
+    if k <= 0 or len(scores) == 0:
+        return doc_ids[:0], scores[:0]
+
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        kth = scores[part].min()
+        keep = np.flatnonzero(scores >= kth)  # keep boundary ties for the tie-break
+        doc_ids, scores = doc_ids[keep], scores[keep]
+
+    order = np.lexsort((doc_ids, -scores))[:k]
+    return doc_ids[order], scores[order]
+
+
+class Vocabulary:
+    """
+    Sorted term list stored as one UTF-8 blob + offsets (both numpy arrays).
+    Term id == position in sorted order; lookups are a binary search, so no
+    per-term Python objects are needed once the index is memory-mapped.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob          # uint8 [total utf-8 bytes]
+        self.offsets = offsets    # int64 [n_terms + 1]
+
+    @classmethod
+    def from_terms(cls, sorted_terms):
+        encoded = [t.encode("utf-8") for t in sorted_terms]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    # Raw utf-8 bytes of term i (utf-8 byte order == code point order)
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def get(self, term, default=None):
+        key = term.encode("utf-8")
+        i = bisect.bisect_left(self, key)
+        if i < len(self) and self[i] == key:
+            return i
+        return default
+
+
+class BM25Index:
+    """
+    Term -> postings inverted index.
+
+    Postings of term t live in doc_ids/tfs[offsets[t]:offsets[t + 1]],
+    sorted by doc id. idf and max_scores are per term, norm is per doc:
+        norm[d] = k1 * (1 - b + b * doc_len[d] / avgdl)
+        max_scores[t] = highest single-doc BM25 contribution of t (for pruning)
+    """
+
+    def __init__(self, vocab, offsets, doc_ids, tfs, doc_len, idf, norm, max_scores=None, k1=K1, b=B):
+        self.vocab = vocab        # Vocabulary: term -> term id
+        self.offsets = offsets    # int64 [n_terms + 1]
+        self.doc_ids = doc_ids    # int32 [n_postings]
+        self.tfs = tfs            # int32 [n_postings]
+        self.doc_len = doc_len    # int32 [n_docs]
+        self.idf = idf            # float64 [n_terms]
+        self.norm = norm          # float64 [n_docs]
+        self.k1 = k1
+        self.b = b
+        self.max_scores = max_scores if max_scores is not None else self._term_upper_bounds()
+        self._term_doc = None     # lazily built CSR impact matrix for batch search
+
+    @property
+    def n_docs(self):
+        return len(self.doc_len)
+
+    @classmethod
+    def from_tokenized(cls, tokenized_docs, k1=K1, b=B, epsilon=EPSILON):
+        vocab = {}
+        term_ids, post_docs, post_tfs, doc_len = [], [], [], []
+
+        for doc_id, tokens in enumerate(tokenized_docs):
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                post_docs.append(doc_id)
+                post_tfs.append(tf)
+
+        # Renumber terms so that term id == rank in sorted vocabulary
+        sorted_terms = sorted(vocab)
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[[vocab[t] for t in sorted_terms]] = np.arange(len(vocab))
+        term_ids = rank[np.asarray(term_ids, dtype=np.int64)] if term_ids else np.zeros(0, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")  # stable -> doc ids stay sorted per term
+        doc_ids = np.asarray(post_docs, dtype=np.int32)[order]
+        tfs = np.asarray(post_tfs, dtype=np.int32)[order]
+
+        df = np.bincount(term_ids, minlength=len(vocab))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        doc_len = np.asarray(doc_len, dtype=np.int32)
+        n_docs = len(doc_len)
+        avgdl = doc_len.sum() / n_docs if n_docs else 0.0
+
+        # ATIRE-style idf with an epsilon floor for terms in > half the docs
+        idf = np.array([math.log(n_docs - f + 0.5) - math.log(f + 0.5) for f in df], dtype=np.float64)
+        if len(idf):
+            idf[idf < 0] = epsilon * idf.mean()
+
+        norm = k1 * (1 - b + b * doc_len / avgdl) if n_docs else np.zeros(0)
+
+        return cls(Vocabulary.from_terms(sorted_terms), offsets, doc_ids, tfs, doc_len,
+                   idf, norm.astype(np.float64), k1=k1, b=b)
+
+    # BM25 contribution of every posting (term-major, same order as doc_ids)
+    def _posting_impacts(self):
+        term_of_posting = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        return self.impacts(term_of_posting, self.doc_ids, self.tfs)
+
+    # Per-term upper bound: max BM25 contribution over the term's postings
+    def _term_upper_bounds(self):
+        if len(self.doc_ids) == 0:
+            return np.zeros(len(self.offsets) - 1, dtype=np.float64)
+        return np.maximum.reduceat(self._posting_impacts(), self.offsets[:-1])
+
+    # Term x doc CSR matrix of BM25 impacts; the postings already are its CSR layout
+    def term_doc_matrix(self):
+        if self._term_doc is None:
+            self._term_doc = sp.csr_matrix(
+                (self._posting_impacts(), self.doc_ids, self.offsets),
+                shape=(len(self.offsets) - 1, self.n_docs))
+        return self._term_doc
+
+    # Write the index as flat arrays; params.json goes last and marks it complete
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        params_path = os.path.join(path, PARAMS_FILE)
+        if os.path.exists(params_path):
+            os.remove(params_path)
+
+        arrays = {
+            "vocab_blob": self.vocab.blob,
+            "vocab_offsets": self.vocab.offsets,
+            "offsets": self.offsets,
+            "doc_ids": self.doc_ids,
+            "tfs": self.tfs,
+            "doc_len": self.doc_len,
+            "idf": self.idf,
+            "norm": self.norm,
+            "max_scores": self.max_scores,
+        }
+        for name in ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), arrays[name])
+
+        with open(params_path, "w") as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "n_docs": int(self.n_docs),
+                "n_terms": len(self.vocab),
+                "n_postings": int(len(self.doc_ids)),
+            }, f, indent=2)
+
+    # True if a complete index in the current format exists at path
+    @staticmethod
+    def exists(path):
+        params_path = os.path.join(path, PARAMS_FILE)
+        if not os.path.exists(params_path):
+            return False
+        with open(params_path, "r") as f:
+            return json.load(f).get("format_version") == FORMAT_VERSION
+
+    # Open a saved index; arrays are memory-mapped read-only unless mmap=False
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, PARAMS_FILE), "r") as f:
+            params = json.load(f)
+        if params.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format in {path}; rebuild the index.")
+
+        mode = "r" if mmap else None
+        a = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ARRAYS}
+
+        return cls(Vocabulary(a["vocab_blob"], a["vocab_offsets"]), a["offsets"], a["doc_ids"],
+                   a["tfs"], a["doc_len"], a["idf"], a["norm"], a["max_scores"],
+                   k1=params["k1"], b=params["b"])
+
+    # Map query tokens to (term id, query frequency), dropping unknown terms
+    def query_terms(self, query_tokens):
+        counts = Counter(self.vocab.get(t) for t in query_tokens)
+        counts.pop(None, None)
+        return list(counts.items())
+
+    # BM25 contribution of a term for the given postings (docs, tfs)
+    def impacts(self, term_id, docs, tfs, qf=1):
+        tf = tfs.astype(np.float64)
+        return qf * self.idf[term_id] * (tf * (self.k1 + 1) / (tf + self.norm[docs]))
+
+    # BM25 contribution of one term to each doc in its postings
+    def term_scores(self, term_id, qf=1):
+        lo, hi = self.offsets[term_id], self.offsets[term_id + 1]
+        docs = self.doc_ids[lo:hi]
+        return docs, self.impacts(term_id, docs, self.tfs[lo:hi], qf)
+
+    # Score docs that contain a query term and return the top-k.
+    # prune=True uses MaxScore and returns exactly the same hits while
+    # skipping postings that cannot change the top-k. Pass a dict as
+    # `stats` to collect postings counters. `allowed` (bool per doc)
+    # restricts scoring to a subset, e.g. a metadata filter.
+    def search(self, query_tokens, k=5, prune=False, stats=None, allowed=None):
+        terms = self.query_terms(query_tokens)
+        if not terms or k <= 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+
+        # Highest-impact terms first (same order in both modes -> identical sums)
+        terms.sort(key=lambda t: (-t[1] * self.max_scores[t[0]], t[0]))
+
+        # MaxScore bounds assume every term adds >= 0. A negative idf (epsilon
+        # floor with idf.mean() < 0, small corpora) breaks that, so such
+        # queries are scored exhaustively
+        if prune and all(self.idf[t] >= 0 for t, _ in terms):
+            return self._search_maxscore(terms, k, stats, allowed)
+
+        docs, contribs = zip(*(self.term_scores(t, qf) for t, qf in terms))
+        docs, contribs = np.concatenate(docs), np.concatenate(contribs)
+        n = len(docs)
+        if allowed is not None:
+            keep = allowed[docs]
+            docs, contribs = docs[keep], contribs[keep]
+
+        docs, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=contribs)
+
+        if stats is not None:
+            _count(stats, postings=n, scored=len(inverse), skipped=n - len(inverse))
+
+        return top_k(docs, scores, k)
+
+    # MaxScore, term-at-a-time: once the summed upper bounds of the remaining
+    # terms fall below the current k-th best score, no unseen doc can enter
+    # the top-k, so later terms only probe existing candidates (binary search
+    # into their doc-sorted postings) and every other posting is skipped.
+    def _search_maxscore(self, terms, k, stats, allowed=None):
+        bounds = np.array([qf * self.max_scores[t] for t, qf in terms]) * BOUND_SLACK
+        rest = np.append(np.cumsum(bounds[::-1])[::-1], 0.0)  # rest[i] = bound of terms i..end
+
+        cand_docs = np.zeros(0, dtype=np.int64)
+        cand_scores = np.zeros(0, dtype=np.float64)
+        n_postings = n_scored = 0
+
+        for i, (t, qf) in enumerate(terms):
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            n_postings += hi - lo
+            threshold = kth_largest(cand_scores, k)
+
+            if rest[i] >= threshold:
+                # Essential term: walk the full postings list
+                docs, contrib = self.term_scores(t, qf)
+                if allowed is not None:  # filtered-out docs never become candidates
+                    keep = allowed[docs]
+                    docs, contrib = docs[keep], contrib[keep]
+                cand_docs, inverse = np.unique(np.concatenate([cand_docs, docs]), return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=np.concatenate([cand_scores, contrib]))
+                n_scored += len(docs)
+                continue
+
+            # Non-essential: drop candidates that can no longer reach the top-k
+            alive = cand_scores + rest[i] >= threshold
+            cand_docs, cand_scores = cand_docs[alive], cand_scores[alive]
+
+            posting_docs = self.doc_ids[lo:hi]
+            pos = np.searchsorted(posting_docs, cand_docs)
+            found = pos < len(posting_docs)
+            found[found] = posting_docs[pos[found]] == cand_docs[found]
+            hit_pos = pos[found]
+
+            cand_scores[found] += self.impacts(t, cand_docs[found], self.tfs[lo + hit_pos], qf)
+            n_scored += len(hit_pos)
+
+        if stats is not None:
+            _count(stats, postings=n_postings, scored=n_scored, skipped=n_postings - n_scored)
+
+        return top_k(cand_docs, cand_scores, k)
+
+    # Score many queries with one sparse (queries x terms) @ (terms x docs)
+    # multiply, then pick each row's top-k with top_k() over the row's
+    # nonzero scores (same tie handling as search(), so both agree).
+    # Returns a list of (doc_ids, scores) per query, like search().
+    # `allowed` (bool per doc) applies one filter to every query.
+    def search_batch(self, queries_tokens, k=5, allowed=None):
+        rows, cols, data = [], [], []
+        for row, tokens in enumerate(queries_tokens):
+            for t, qf in self.query_terms(tokens):
+                rows.append(row)
+                cols.append(t)
+                data.append(qf)
+
+        n_queries = len(queries_tokens)
+        query_terms = sp.csr_matrix((np.asarray(data, dtype=np.float64), (rows, cols)),
+                                    shape=(n_queries, len(self.offsets) - 1))
+        scores = (query_terms @ self.term_doc_matrix()).tocsr()
+        scores.sort_indices()
+
+        results = []
+        for row in range(n_queries):
+            lo, hi = scores.indptr[row], scores.indptr[row + 1]
+            # Only docs that match a query term have an entry in the row
+            docs, values = scores.indices[lo:hi].astype(np.int32), scores.data[lo:hi]
+            if allowed is not None:
+                keep = allowed[docs]
+                docs, values = docs[keep], values[keep]
+            results.append(top_k(docs, values, k))
+
+        return results
@@ -0,0 +1,66 @@
+"""
+spaCy-free query analyzer for sparse retrieval.
+Uses a surface-form -> lemma table and the stopword set exported at index
+build time, so queries get the same tokens as the indexed lemmas in
+microseconds instead of running the spaCy pipeline per question.
+"""
+
+import os
+import json
+from sparse.text_normalize import normalize
+
+LEXICON_FILE = "lexicon.json"
+
+# Cheap de-inflection rules, tried only for words never seen at build time
+SUFFIX_RULES = [("ies", "y"), ("ves", "f"), ("es", ""), ("s", ""),
+                ("ing", ""), ("ing", "e"), ("ied", "y"), ("ed", ""), ("ed", "e")]
+
+
+class QueryAnalyzer:
+    def __init__(self, lemmas, stop_words):
+        self.lemmas = lemmas                  # surface form -> most frequent lemma
+        self.stop_words = frozenset(stop_words)
+        self.known = frozenset(lemmas.values())
+
+    # Keep the most frequent lemma for each surface form
+    @classmethod
+    def from_counts(cls, lemma_counts, stop_words):
+        best = {}
+        for (surface, lemma), n in lemma_counts.items():
+            if surface not in best or n > best[surface][1]:
+                best[surface] = (lemma, n)
+        return cls({surface: lemma for surface, (lemma, _) in best.items()}, stop_words)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, LEXICON_FILE), "w") as f:
+            json.dump({"lemmas": self.lemmas, "stop_words": sorted(self.stop_words)}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, LEXICON_FILE), "r") as f:
+            data = json.load(f)
+        return cls(data["lemmas"], data["stop_words"])
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, LEXICON_FILE))
+
+    def lemma(self, word):
+        if word in self.lemmas:
+            return self.lemmas[word]
+        for suffix, replacement in SUFFIX_RULES:
+            if word.endswith(suffix) and len(word) > len(suffix) + 1:
+                candidate = word[:-len(suffix)] + replacement
+                if candidate in self.known:
+                    return candidate
+        return word
+
+    # Same steps as preprocess_sparse.clean(): the same normalize(), then
+    # keep alphabetic non-stopwords, map to lemmas
+    def analyze(self, query: str) -> str:
+        query = normalize(query)
+        return " ".join(
+            self.lemma(word) for word in query.split()
+            if word.isalpha() and word not in self.stop_words
+        )
@@ -1,48 +1,80 @@
-import json
 import os
-import pickle
-import numpy as np
-from rank_bm25 import BM25Okapi
+from sparse.bm25_index import BM25Index
+from sparse.query_analyzer import QueryAnalyzer
+from metadata_filter import MetadataIndex
+from metadata_store import MetadataStore
+from text_store import TextStore
 
 # Path to saved index directory
 INDEX_DIR = "index"
+BM25_INDEX_DIR = "bm25"  # flat, memory-mappable BM25 arrays (see sparse/bm25_index.py)
+METADATA_DIR = "bm25_meta"  # columnar chunk metadata (see metadata_store.py)
+TEXT_DIR = "bm25_text"      # memory-mapped chunk texts (see text_store.py)
+
+# MaxScore dynamic pruning: same hits as exhaustive scoring, fewer postings scored
+PRUNING = True
 
 # Global vars to hold loaded BM25 components
 bm25 = None
-bm25_corpus = None
-bm25_meta = None
+bm25_corpus = None  # TextStore of readable chunk texts: only returned chunks are decoded
+bm25_meta = None  # MetadataStore: hit dicts are built only for returned chunks
+analyzer = None
+metadata_index = None  # per-value chunk bitmaps for filtered search
 
 # Load all BM25 components (index, corpus, metadata)
 def load_indexes():
-    global bm25, bm25_corpus, bm25_meta
+    global bm25, bm25_corpus, bm25_meta, analyzer, metadata_index
+
+    # Memory-mapped: startup is near-instant and pages are shared across processes
+    bm25 = BM25Index.load(os.path.join(INDEX_DIR, BM25_INDEX_DIR))
+    analyzer = QueryAnalyzer.load(os.path.join(INDEX_DIR, BM25_INDEX_DIR))
 
-    with open(os.path.join(INDEX_DIR, "bm25.pkl"), "rb") as f:
-        bm25 = pickle.load(f)
+    bm25_corpus = TextStore.load(os.path.join(INDEX_DIR, TEXT_DIR))
+    # Indexes built before the columnar metadata store are converted on first load
+    bm25_meta = MetadataStore.load_or_migrate(os.path.join(INDEX_DIR, METADATA_DIR),
+                                              os.path.join(INDEX_DIR, "bm25_metadata.json"),
+                                              count_field="words")
+    metadata_index = MetadataIndex.from_store(bm25_meta)
 
-    with open(os.path.join(INDEX_DIR, "bm25_corpus.json"), "r") as f:
-        bm25_corpus = json.load(f)
+# True once a complete BM25 index has been written to disk
+def index_exists():
+    path = os.path.join(INDEX_DIR, BM25_INDEX_DIR)
+    return BM25Index.exists(path) and QueryAnalyzer.exists(path)
+
+# Lowercase, strip punctuation, drop stopwords and lemmatize a raw question
+# with the table exported at build time (no spaCy needed)
+def analyze(query: str) -> str:
+    if analyzer is None:
+        load_indexes()
+    return analyzer.analyze(query)
 
-    with open(os.path.join(INDEX_DIR, "bm25_metadata.json"), "r") as f:
-        bm25_meta = json.load(f)
+# Hit dicts for one query's top-k (texts decoded only for these)
+def format_hits(doc_ids, scores):
+    return [{
+        "score": float(score),
+        "doc": text,
+        "meta": bm25_meta.meta(i),
+        "method": "bm25",
+        "id": int(i)  # chunk id in the BM25 index
+    } for i, score, text in zip(doc_ids, scores, bm25_corpus.get_many(doc_ids))]
 
-# Perform top-k BM25 retrieval
-def retrieve(query: str, k=5):
+# Perform top-k BM25 retrieval.
+# filters: optional metadata filter, e.g. {"title": "Governing the Moon"}
+# (see metadata_filter.py); only matching chunks are scored. BM25 chunks
+# record the same page spans as dense ones, so "pages" filters work too.
+def retrieve(query: str, k=5, prune=PRUNING, filters=None):
     if bm25 is None:
         load_indexes()
 
-    # Tokenize the query
+    # Tokenize the query and score only the postings of its terms
     query_tokens = query.strip().split()
-    scores = bm25.get_scores(query_tokens)
+    top_k_indices, scores = bm25.search(query_tokens, k, prune=prune, allowed=metadata_index.mask(filters))
+    return format_hits(top_k_indices, scores)
 
-    # Get top-k indices
-    top_k_indices = np.argsort(scores)[::-1][:k]
-
-    # Collect top-k hits
-    hits = [{
-        "score": float(scores[i]),
-        "doc": bm25_corpus[i],
-        "meta": bm25_meta[i],
-        "method": "bm25"
-    } for i in top_k_indices]
+# Top-k BM25 retrieval for many queries at once (one sparse matrix multiply)
+def retrieve_batch(queries, k=5, filters=None):
+    if bm25 is None:
+        load_indexes()
 
-    return hits
+    results = bm25.search_batch([q.strip().split() for q in queries], k, allowed=metadata_index.mask(filters))
+    return [format_hits(doc_ids, scores) for doc_ids, scores in results]
@@ -1,52 +1,106 @@
 import os
-import json
-import pickle
-from rank_bm25 import BM25Okapi
-from corpus_preloader.load_all_data import load_all_data
-from sparse.sparse_corpus_loader.preprocess_sparse import preprocess
+import sys
+from collections import Counter
+from corpus_preloader.load_all_data import load_all_data, INCLUDE_NASA_DATA
+from corpus_preloader.extract_cache import EXTRACTOR_VERSION
+from sparse.sparse_corpus_loader.preprocess_sparse import preprocess, stop_words, SPACY_MODEL
+# Same chunking as the dense index, so hybrid fusion can match passages (see preprocess.py)
+from dense.dense_corpus_loader.preprocess import CHUNK_TOKENS, CHUNK_OVERLAP, CHUNK_STRATEGY, CHUNKER_VERSION
+from sparse.bm25_index import BM25Index, FORMAT_VERSION
+from sparse.query_analyzer import QueryAnalyzer
+from sparse.retrieval_bm25 import BM25_INDEX_DIR, METADATA_DIR, TEXT_DIR, index_exists
+from metadata_store import MetadataStoreWriter
+from text_store import TextStoreWriter
+import index_manifest
 
 # Directory to store BM25 index and related files
 INDEX_DIR = "index"
 os.makedirs(INDEX_DIR, exist_ok=True)
+TEXT_COMPRESSION = None  # "zstd" compresses the chunk text store per block (needs zstandard)
+MANIFEST = "bm25"  # index/bm25_manifest.json: what the index was built from (see index_manifest.py)
+# Chunk text store contents: 2 = readable chunk text (1 stored the lemmatized terms)
+TEXT_FORMAT = 2
 
-# Utility function to save JSON data
-def save_json(obj, filename):
-    with open(os.path.join(INDEX_DIR, filename), "w") as f:
-        json.dump(obj, f, indent=2)
+# Inputs of the BM25 terms and stores (chunking, lemmatizer, formats); see
+# index_manifest.check() for what a change triggers
+def manifest_config():
+    return {
+        "extractor": EXTRACTOR_VERSION,
+        "include_nasa_data": INCLUDE_NASA_DATA,
+        "chunk_tokens": CHUNK_TOKENS,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "chunk_strategy": CHUNK_STRATEGY,
+        "chunker": CHUNKER_VERSION,
+        "spacy_model": SPACY_MODEL,
+        "bm25_format": FORMAT_VERSION,
+        "text_format": TEXT_FORMAT,
+    }
 
 # Builds BM25 index from corpus
-def build():
-    bm25_path = os.path.join(INDEX_DIR, "bm25.pkl")
-    if os.path.exists(bm25_path):
+def build(force=False):
+    if index_exists() and not force:
         print("✅ BM25 index already exists. Skipping build.")
         return
 
+    # The old index stops being valid the moment its files are overwritten
+    index_manifest.invalidate(INDEX_DIR, MANIFEST)
+    sources = index_manifest.build_sources()
+
     print("📦 Loading data...")
     raw_docs, raw_meta = load_all_data()
 
     print("🧹 Preprocessing and chunking...")
-    chunks, chunk_meta = preprocess(
+    lemma_counts = Counter()
+    chunks, texts, chunk_meta = preprocess(
         raw_docs,
         raw_meta,
-        max_words=270,  # max tokens no lemma or max word with lemma
-        overlap=40
+        max_tokens=CHUNK_TOKENS,
+        overlap=CHUNK_OVERLAP,
+        strategy=CHUNK_STRATEGY,
+        lemma_counts=lemma_counts
     )
 
-    print("🧠 Tokenizing chunks...")
+    print("🧠 Tokenizing chunks and building inverted index...")
     tokenized_chunks = [chunk.split() for chunk in chunks]
-    bm25 = BM25Okapi(tokenized_chunks)
+    bm25 = BM25Index.from_tokenized(tokenized_chunks)
 
     print("💾 Saving index and metadata...")
-    with open(bm25_path, "wb") as f:
-        pickle.dump(bm25, f)
+    with TextStoreWriter(os.path.join(INDEX_DIR, TEXT_DIR), TEXT_COMPRESSION) as corpus:
+        # Readable text, not the lemmatized terms: hits are shown to the LLM
+        # and scored by the cross-encoder, which expect natural text.
+        # Same chunks as index/dense_text, but kept separately: the dense
+        # index is updated in place (appended / tombstoned rows) and rebuilt
+        # on its own config, so BM25 rows pointing into it would go stale
+        for text in texts:
+            corpus.write(text)
+    with MetadataStoreWriter(os.path.join(INDEX_DIR, METADATA_DIR)) as store:
+        for meta in raw_meta:
+            store.write_document(meta)
+        for meta in chunk_meta:
+            store.write_chunk(meta)
+    # Raw documents are archived by the dense build only (its doc ids match them)
+
+    # Surface -> lemma table + stopwords for spaCy-free query analysis
+    QueryAnalyzer.from_counts(lemma_counts, stop_words()).save(os.path.join(INDEX_DIR, BM25_INDEX_DIR))
 
-    save_json(chunks, "bm25_corpus.json")
-    save_json(chunk_meta, "bm25_metadata.json")
-    save_json(raw_docs, "raw_corpus.json")
-    save_json(raw_meta, "raw_metadata.json")
+    # Saved last: its params.json marks the whole sparse index as complete
+    bm25.save(os.path.join(INDEX_DIR, BM25_INDEX_DIR))
+    index_manifest.save(INDEX_DIR, MANIFEST, manifest_config(), {"type": "bm25"}, sources)
 
     print("✅ BM25 index built and saved.")
 
+# Startup check (see index_manifest.py). BM25 statistics are corpus-wide,
+# so any change to the inputs means a rebuild.
+def ensure_fresh():
+    plan = index_manifest.check(INDEX_DIR, MANIFEST, manifest_config(), index_exists())
+    if plan.action == "skip":
+        print("✅ BM25 index is up to date.")
+        index_manifest.refresh(INDEX_DIR, MANIFEST, plan)
+    else:
+        print(f"🔧 Rebuilding BM25 index: {plan.reason}.")
+        build(force=True)
+    return plan
+
 # Run if this file is executed directly
 if __name__ == "__main__":
-    build()
+    build(force="--force" in sys.argv)
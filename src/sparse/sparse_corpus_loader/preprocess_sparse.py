@@ -1,81 +1,104 @@
 """
 Text cleaning + chunking for sparse retrieval (e.g., BM25).
-Removes stopwords, lemmatizes, and splits into overlapping word chunks.
-Emits per-chunk metadata for citations.
+Documents are chunked exactly like the dense index (same cleaning, token
+windows and page spans, see dense preprocess.py), so a (document, chunk_id)
+pair names the same passage in both indexes; each chunk is then normalized,
+stripped of stopwords and lemmatized into BM25 terms.
+Lemmatization streams every chunk through nlp.pipe across a process pool.
 """
 
-import html
-import unicodedata
-import re
+import os
+import time
 import itertools
-import spacy
-
-# Load spaCy model once (download with: python -m spacy download en_core_web_sm)
-nlp = spacy.load("en_core_web_sm")
+from sparse.text_normalize import normalize
+from dense.dense_corpus_loader.preprocess import iter_chunks, CHUNK_TOKENS, CHUNK_OVERLAP, CHUNK_STRATEGY
+
+# spaCy model, loaded on first use (download with: python -m spacy download en_core_web_sm)
+SPACY_MODEL = "en_core_web_sm"
+_nlp = None
+
+CHUNK_SIZE = 50000  # 50K characters per spaCy doc (safe, below nlp.max_length)
+N_PROCESS = max(1, (os.cpu_count() or 2) // 2)  # spaCy worker processes
+BATCH_SIZE = 4  # 50K-char slices per worker batch
+CHUNK_BATCH_SIZE = 256  # ~300-token chunks per worker batch
+
+# Only lemma_/is_alpha/is_stop are used, so the parser and NER are never loaded.
+# spaCy is imported here so that only index builds pay for it.
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        import spacy
+        _nlp = spacy.load(SPACY_MODEL, exclude=["parser", "ner"])
+    return _nlp
+
+# Stopword set used by token.is_stop (exported for the query analyzer)
+def stop_words():
+    return set(get_nlp().Defaults.stop_words)
+
+def clean_many(texts, *, n_process=N_PROCESS, batch_size=BATCH_SIZE, verbose=True,
+               lemma_counts=None):
+    """
+    Normalize + lemmatize many documents in one nlp.pipe stream.
+    Output is identical to calling clean() on each text.
+    If lemma_counts (a Counter) is given, it is filled with
+    (surface form, lemma) frequencies for the query analyzer.
+    """
+    # Split into safe-size slices (below spaCy's max length), tagged with their doc index
+    slices = (
+        (text[i:i + CHUNK_SIZE], doc_idx)
+        for doc_idx, text in enumerate(normalize(t) for t in texts)
+        for i in range(0, len(text), CHUNK_SIZE)
+    )
+
+    lemmas = [[] for _ in texts]
+    start = time.perf_counter()
+    n_slices = 0
+
+    # as_tuples keeps the doc index attached; pipe preserves input order
+    pipe = get_nlp().pipe(slices, as_tuples=True, n_process=n_process, batch_size=batch_size)
+    for doc, doc_idx in pipe:
+        kept = [t for t in doc if t.is_alpha and not t.is_stop]
+        lemmas[doc_idx].extend(t.lemma_ for t in kept)
+        if lemma_counts is not None:
+            lemma_counts.update((t.text, t.lemma_) for t in kept)
+        n_slices += 1
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    if verbose:
+        print(f"🧠 Lemmatized {len(texts)} docs ({n_slices} slices) in {elapsed:.1f}s "
+              f"— {len(texts) / elapsed:.2f} docs/sec, {n_slices / elapsed:.2f} slices/sec "
+              f"(n_process={n_process}, batch_size={batch_size})")
+
+    return [" ".join(doc_lemmas).strip() for doc_lemmas in lemmas]
 
 def clean(text: str) -> str:
-    # HTML decode, normalize, clean punctuation, etc.
-    text = html.unescape(text)
-    text = unicodedata.normalize("NFKC", text)
-    text = re.sub(r'[\u00ad\u200b\u200e\u200f]', '', text)
-    text = text.replace('“', '"').replace('”', '"')
-    text = text.replace("‘", "'").replace("’", "'")
-    text = text.replace("–", "-").replace("—", "-")
-    text = re.sub(r'\r\n|\r', '\n', text)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)
-    text = re.sub(r"[^\w\s]", '', text)
-    text = text.lower()
-
-    # Split into safe-size chunks (below spaCy's max length)
-    chunk_size = 50000  # 50K characters per batch (safe)
-    lemmas = []
-
-    for i in range(0, len(text), chunk_size):
-        chunk = text[i:i + chunk_size]
-        doc = nlp(chunk)
-        chunk_lemmas = [t.lemma_ for t in doc if t.is_alpha and not t.is_stop]
-        lemmas.extend(chunk_lemmas)
-
-    return " ".join(lemmas).strip()
-
-
-
-def chunk(text: str, max_words=270, overlap=40):
-    words = text.split()
-    ptr = 0
-    while ptr < len(words):
-        chunk_words = words[ptr:ptr + max_words]
-        yield " ".join(chunk_words)
-        ptr += max_words - overlap
-
-def preprocess(docs, meta_in, *, max_words=270, overlap=40):
+    return clean_many([text], n_process=1, verbose=False)[0]
+
+
+
+def preprocess(docs, meta_in, *, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP, strategy=CHUNK_STRATEGY,
+               n_process=N_PROCESS, batch_size=CHUNK_BATCH_SIZE, lemma_counts=None):
     """
-    Flatten, clean, lemmatize, and chunk documents.
+    Chunk documents like the dense index, then clean + lemmatize each chunk.
     Returns:
-        - chunks: list of text chunks
-        - meta_out: list of metadata dicts for each chunk
+        - chunks: list of lemmatized chunk texts (the BM25 terms)
+        - texts: the readable chunk texts (what hits show and rerankers read)
+        - meta_out: list of compact chunk metadata dicts (doc_id, chunk_id,
+          tokens, page span), as the dense index records them; document
+          fields are kept once in the metadata store
     """
-    chunks, meta_out = [], []
     print("🧹 Preprocessing documents...")
 
-    for doc_id, doc in enumerate(itertools.chain.from_iterable(
-            d if isinstance(d, list) else [d] for d in docs)):
-
-        cleaned = clean(doc)
-        source_meta = meta_in[doc_id]
-
-        for ck_id, ck in enumerate(chunk(cleaned, max_words, overlap)):
-            chunk_meta = {
-                "doc_id": doc_id,
-                "chunk_id": ck_id,
-                "words": len(ck.split()),
-                **source_meta
-            }
-            chunks.append(ck)
-            meta_out.append(chunk_meta)
+    flat_docs = itertools.chain.from_iterable(
+        d if isinstance(d, list) else [d] for d in docs)
+    texts, meta_out = [], []
+    for text, chunk_meta in iter_chunks(zip(flat_docs, meta_in), max_tokens=max_tokens,
+                                        overlap=overlap, strategy=strategy):
+        texts.append(text)
+        meta_out.append(chunk_meta)
 
-    return chunks, meta_out
+    chunks = clean_many(texts, n_process=n_process, batch_size=batch_size, lemma_counts=lemma_counts)
+    return chunks, texts, meta_out
 
 
 
@@ -0,0 +1,23 @@
+"""
+Text normalization shared by the BM25 index build (preprocess_sparse.py)
+and the query analyzer, so documents and queries split into the same words.
+Kept free of spaCy / tiktoken: the query side imports it at search time.
+"""
+
+import html
+import unicodedata
+import re
+
+def normalize(text: str) -> str:
+    # HTML decode, normalize, clean punctuation, etc.
+    text = html.unescape(text)
+    text = unicodedata.normalize("NFKC", text)
+    text = re.sub(r'[\u00ad\u200b\u200e\u200f]', '', text)
+    text = text.replace('“', '"').replace('”', '"')
+    text = text.replace("‘", "'").replace("’", "'")
+    text = text.replace("–", "-").replace("—", "-")
+    text = re.sub(r'\r\n|\r', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r'(?<!\n)\n(?!\n)', ' ', text)
+    text = re.sub(r"[^\w\s]", '', text)
+    return text.lower()
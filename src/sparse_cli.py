@@ -1,16 +1,15 @@
 #!/usr/bin/env python
 """
 Lightweight CLI for local Q&A that:
- • retrieves top-k chunks (BM25+FAISS),
+ • retrieves top-k chunks (BM25; hybrid_cli.py runs BM25+FAISS),
  • feeds them to Mistral with an *answer-only-if-supported* prompt,
  • prints answer + structured citations.
 """
 
 import os, re, textwrap, json
-from sparse.retrieval_bm25 import retrieve
+from sparse.retrieval_bm25 import retrieve, analyze
 from load_mistral import load as load_llm
-from sparse.sparse_corpus_loader.build_index_bm25 import build
-import spacy  # <-- new import
+from sparse.sparse_corpus_loader.build_index_bm25 import ensure_fresh
 
 # Constants
 K             = 5  #this is the max to not run out of tokens in mistral....
@@ -32,24 +31,10 @@ Context:
 Answer:
 """
 
-# Load spaCy model once
-nlp = spacy.load("en_core_web_sm")
-
 def clean_query(query: str) -> str:
-    # Apply same cleaning + lemmatization logic as preprocess.py clean()
-    
-    # Lowercase and remove punctuation (similar to preprocess)
-    query = query.lower()
-    query = re.sub(r"[^\w\s]", ' ', query)
-    query = re.sub(r"\s+", " ", query).strip()
-
-    # Lemmatize with spaCy and remove stopwords
-    doc = nlp(query)
-    lemmas = [
-        token.lemma_ for token in doc
-        if token.is_alpha and not token.is_stop
-    ]
-    return ' '.join(lemmas)
+    # Same cleaning + lemmatization as preprocess_sparse.clean(), via the
+    # lemma table exported at index build time (no spaCy at query time)
+    return analyze(query)
 
 def format_context(hits):
     lines = []
@@ -64,14 +49,9 @@ def ensure_ready():
 
     print("\n🔍 Checking for existing data and indexes...")
 
-    bm25_path = os.path.join(INDEX_DIR, "bm25.pkl")
-  
-    if not os.path.exists(bm25_path):
-        print("🔧 Index files not found. Building indexes...")
-        build()  # This calls load_all_data() internally
-        print("✅ All indexes built.\n")
-    else:
-        print("✅ Index files found. Skipping index building.\n")
+    # Rebuilds the index if it is missing or its inputs changed (see index_manifest.py)
+    ensure_fresh()
+    print("✅ Index files ready.\n")
 
 
 def main():
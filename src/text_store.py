@@ -0,0 +1,262 @@
+"""
+Memory-mapped text store shared by the dense and sparse indexes (chunk
+texts) and the raw document archive.
+On disk a store is a directory holding:
+  - blob.bin     UTF-8 texts back to back (or zstd-compressed blocks of them)
+  - offsets.npy  int64, text i is bytes offsets[i]:offsets[i+1] of the
+                 (decompressed) blob
+  - blocks.npy   zstd only: first text id and compressed byte offset of
+                 each block (2 x n_blocks+1)
+  - removed.npy  ids of tombstoned texts (read back as None)
+  - params.json  written last: marks the store complete and records how
+                 many texts are valid
+Opening a store maps the files without reading them, and get_many()
+decodes only the requested texts (decompressing only their blocks), so
+retrievers never hold the corpus in memory. zstd compression needs the
+optional `zstandard` package, imported only when used.
+"""
+import os
+import json
+from array import array
+import numpy as np
+
+FORMAT_VERSION = 1
+COMPRESSIONS = (None, "zstd")
+PARAMS_FILE = "params.json"
+BLOB_FILE = "blob.bin"
+BLOCK_BYTES = 64 * 1024  # zstd: uncompressed bytes per block (smaller = cheaper random access)
+ZSTD_LEVEL = 3
+
+# Write an array to <path>.npy atomically (temp file, then rename); also
+# used by metadata_store.py
+def save_array(path, values):
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, values)
+    os.replace(tmp_path, f"{path}.npy")
+
+def _load_params(path):
+    with open(os.path.join(path, PARAMS_FILE), "r") as f:
+        params = json.load(f)
+    if params.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported text store format in {path}; rebuild the index.")
+    return params
+
+def _save_params(path, params):
+    tmp_path = os.path.join(path, PARAMS_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"format_version": FORMAT_VERSION, **params}, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, PARAMS_FILE))
+
+
+class TextStore:
+    def __init__(self, blob, offsets, removed=(), blocks=None):
+        self.blob = blob
+        self.offsets = offsets
+        self.removed = set(int(i) for i in removed)
+        self.blocks = blocks  # None, or (first text id, compressed offset) per block
+        self._decompressor = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def is_removed(self, i):
+        return int(i) in self.removed
+
+    def _decompress(self, data):
+        if self._decompressor is None:
+            import zstandard  # optional: only zstd-compressed stores need it
+
+            self._decompressor = zstandard.ZstdDecompressor()
+        return self._decompressor.decompress(bytes(data))
+
+    def get(self, i):
+        return self.get_many([i])[0]
+
+    def __getitem__(self, i):
+        return self.get(i)
+
+    # Texts for the given ids (None for removed ones); compressed blocks are
+    # decompressed once per call however many of the ids they hold
+    def get_many(self, ids):
+        ids = [int(i) for i in ids]
+        if self.blocks is None:
+            return [None if i in self.removed else
+                    bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8") for i in ids]
+
+        first_ids, block_offsets = self.blocks
+        decoded = {}
+        texts = []
+        for i in ids:
+            if i in self.removed:
+                texts.append(None)
+                continue
+            b = int(np.searchsorted(first_ids, i, side="right")) - 1
+            if b not in decoded:
+                decoded[b] = self._decompress(self.blob[block_offsets[b]:block_offsets[b + 1]])
+            base = self.offsets[first_ids[b]]
+            texts.append(decoded[b][self.offsets[i] - base:self.offsets[i + 1] - base].decode("utf-8"))
+        return texts
+
+    # All texts in id order, decoded 1024 at a time
+    def __iter__(self):
+        for start in range(0, len(self), 1024):
+            yield from self.get_many(range(start, min(start + 1024, len(self))))
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, PARAMS_FILE))
+
+    # Open a saved store; the blob is memory-mapped read-only unless mmap=False
+    @classmethod
+    def load(cls, path, mmap=True):
+        params = _load_params(path)
+        n = params["n_texts"]
+        mode = "r" if mmap else None
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode=mode)[:n + 1]
+
+        blocks = None
+        if params["compression"] is not None:
+            blocks = np.load(os.path.join(path, "blocks.npy"), mmap_mode=mode)[:, :params["n_blocks"] + 1]
+            blob_size = int(blocks[1, -1])
+        else:
+            blob_size = int(offsets[-1])
+
+        blob_path = os.path.join(path, BLOB_FILE)
+        if blob_size == 0:
+            blob = b""  # np.memmap can't map an empty file
+        elif mmap:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r", shape=(blob_size,))
+        else:
+            with open(blob_path, "rb") as f:
+                blob = f.read(blob_size)
+
+        removed = np.load(os.path.join(path, "removed.npy")) if params["n_removed"] else ()
+        return cls(blob, offsets, removed, blocks)
+
+    # Tombstone texts by id (their bytes stay; every other id is unchanged)
+    @staticmethod
+    def remove(path, ids):
+        params = _load_params(path)
+        removed_path = os.path.join(path, "removed.npy")
+        removed = np.load(removed_path) if params["n_removed"] else np.zeros(0, dtype=np.int64)
+        removed = np.union1d(removed, np.asarray(list(ids), dtype=np.int64))
+        save_array(os.path.join(path, "removed"), removed)
+        _save_params(path, {**params, "n_removed": len(removed)})
+
+    # Open the store at path, converting a legacy JSON array of texts (null =
+    # removed) once if that is all an older build left behind
+    @classmethod
+    def load_or_migrate(cls, path, legacy_json, compression=None):
+        if not cls.exists(path) and os.path.exists(legacy_json):
+            print(f"🔄 Converting {os.path.basename(legacy_json)} to a memory-mapped text store...")
+            with open(legacy_json, "r") as f:
+                texts = json.load(f)
+            with TextStoreWriter(path, compression) as writer:
+                for text in texts:
+                    writer.write(text)
+        return cls.load(path)
+
+
+class TextStoreWriter:
+    """
+    Streams texts into a store, appending to the blob as they arrive.
+    params.json is only (re)written on a clean close, so readers never see
+    a partial store; with append=True, texts are added after the existing
+    ones (the store keeps the compression it was built with).
+    """
+
+    def __init__(self, path, compression=None, append=False, block_bytes=BLOCK_BYTES):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Invalid compression '{compression}'. Choose one of {COMPRESSIONS}.")
+        self.path = path
+        self.compression = compression
+        self.append = append
+        self.block_bytes = block_bytes
+        self.offsets = array("q", [0])
+        self.removed = []
+        self.first_ids, self.block_offsets = array("q", [0]), array("q", [0])
+        self._pending = []  # zstd: texts of the block being filled
+        self._pending_bytes = 0
+        self._compressor = None
+        self._f = None
+
+    @property
+    def count(self):
+        return len(self.offsets) - 1
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        blob_path = os.path.join(self.path, BLOB_FILE)
+        if self.append:
+            store = TextStore.load(self.path)
+            self.compression = _load_params(self.path)["compression"]
+            self.offsets = array("q", np.ascontiguousarray(store.offsets).tobytes())
+            self.removed = sorted(store.removed)
+            if store.blocks is not None:
+                self.first_ids, self.block_offsets = (array("q", np.ascontiguousarray(row).tobytes())
+                                                      for row in store.blocks)
+            del store
+            self._f = open(blob_path, "r+b")
+            # Drop bytes past the recorded end (an append that never completed)
+            self._f.truncate(self.block_offsets[-1] if self.compression else self.offsets[-1])
+            self._f.seek(0, os.SEEK_END)
+        else:
+            params_path = os.path.join(self.path, PARAMS_FILE)
+            if os.path.exists(params_path):
+                os.remove(params_path)
+            self._f = open(blob_path, "wb")
+        if self.compression == "zstd":
+            import zstandard  # optional: only zstd-compressed stores need it
+
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return self
+
+    # None marks a removed row (kept so every other text keeps its id)
+    def write(self, text):
+        data = b"" if text is None else text.encode("utf-8")
+        if text is None:
+            self.removed.append(self.count)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+        if self._compressor is None:
+            self._f.write(data)
+            return
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= self.block_bytes:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._pending:
+            return
+        compressed = self._compressor.compress(b"".join(self._pending))
+        self._f.write(compressed)
+        self.first_ids.append(self.count)
+        self.block_offsets.append(self.block_offsets[-1] + len(compressed))
+        self._pending, self._pending_bytes = [], 0
+
+    def close(self):
+        if self._compressor is not None:
+            self._flush_block()
+        self._f.close()
+
+        save_array(os.path.join(self.path, "offsets"), np.frombuffer(self.offsets, dtype=np.int64))
+        if self.compression is not None:
+            save_array(os.path.join(self.path, "blocks"),
+                        np.stack([np.frombuffer(self.first_ids, dtype=np.int64),
+                                  np.frombuffer(self.block_offsets, dtype=np.int64)]))
+        if self.removed:
+            save_array(os.path.join(self.path, "removed"), np.asarray(self.removed, dtype=np.int64))
+        _save_params(self.path, {
+            "compression": self.compression,
+            "n_texts": self.count,
+            "n_blocks": len(self.block_offsets) - 1,
+            "n_removed": len(self.removed),
+        })
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+        return False
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from sparse.bm25_index import BM25Index
+
+
+def random_index(seed=0, n_docs=400, vocab=30):
+    rng = np.random.default_rng(seed)
+    terms = [f"t{i}" for i in range(vocab)]
+    # Short docs over a small vocabulary: many exactly tied scores
+    docs = [list(rng.choice(terms, size=rng.integers(1, 6))) for _ in range(n_docs)]
+    return BM25Index.from_tokenized(docs), terms, rng
+
+
+def test_search_batch_matches_search_with_ties():
+    index, terms, rng = random_index()
+    queries = [list(rng.choice(terms, size=rng.integers(1, 4))) + ["unknown"] for _ in range(300)]
+    for k in (1, 5, 10):
+        batch = index.search_batch(queries, k)
+        for query, (docs, scores) in zip(queries, batch):
+            expected_docs, expected_scores = index.search(query, k)
+            assert docs.tolist() == expected_docs.tolist()
+            np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_search_batch_filter_and_empty_query():
+    index, terms, rng = random_index(1)
+    allowed = rng.random(index.n_docs) < 0.3
+    queries = [["t1", "t2"], [], ["nope"]]
+    batch = index.search_batch(queries, 5, allowed=allowed)
+    docs, _ = index.search(["t1", "t2"], 5, allowed=allowed)
+    assert batch[0][0].tolist() == docs.tolist()
+    assert allowed[batch[0][0]].all()
+    assert len(batch[1][0]) == 0 and len(batch[2][0]) == 0
+
+
+def assert_same_hits(index, queries, k, allowed=None):
+    for query in queries:
+        docs, scores = index.search(query, k, allowed=allowed)
+        pruned_docs, pruned_scores = index.search(query, k, prune=True, allowed=allowed)
+        assert pruned_docs.tolist() == docs.tolist()
+        np.testing.assert_allclose(pruned_scores, scores)
+
+
+def test_maxscore_matches_exhaustive():
+    for seed in range(3):
+        index, terms, rng = random_index(seed, n_docs=300, vocab=40)
+        queries = [list(rng.choice(terms, size=rng.integers(1, 6))) for _ in range(100)]
+        for k in (1, 3, 10):
+            assert_same_hits(index, queries, k)
+            assert_same_hits(index, queries, k, allowed=rng.random(index.n_docs) < 0.5)
+
+
+def test_maxscore_matches_exhaustive_with_negative_idf():
+    # "a" is in every doc and drags idf.mean() below 0, so the epsilon
+    # floor gives it a negative idf
+    index = BM25Index.from_tokenized([["a"], ["a"], ["a", "b"]])
+    assert index.idf[index.vocab.get("a")] < 0
+    assert index.search(["a", "b"], 1, prune=True)[0].tolist() == [2]
+
+    rng = np.random.default_rng(0)
+    for n_docs in (2, 3, 5, 8):
+        docs = [list(rng.choice(["a", "b", "c"], size=rng.integers(1, 4))) for _ in range(n_docs)]
+        index = BM25Index.from_tokenized(docs)
+        queries = [list(rng.choice(["a", "b", "c"], size=rng.integers(1, 4))) for _ in range(30)]
+        for k in (1, 2, 4):
+            assert_same_hits(index, queries, k)
+            assert_same_hits(index, queries, k, allowed=rng.random(index.n_docs) < 0.7)
+
+
+def test_zero_idf_matches_are_dropped_by_every_path():
+    # "a" is in exactly half the docs: idf == 0, so doc 0 scores exactly 0
+    index = BM25Index.from_tokenized([["a"], ["a", "c"], ["b"], ["b"]])
+    assert index.idf[index.vocab.get("a")] == 0
+    for query in (["a"], ["a", "c"]):
+        docs, scores = index.search(query, 4)
+        assert 0 not in docs.tolist()
+        assert index.search(query, 4, prune=True)[0].tolist() == docs.tolist()
+        (batch_docs, batch_scores), = index.search_batch([query], 4)
+        assert batch_docs.tolist() == docs.tolist()
+        np.testing.assert_allclose(batch_scores, scores)
+
+
+def test_scores_match_rank_bm25():
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    rng = np.random.default_rng(7)
+    terms = [f"t{i}" for i in range(60)]
+    # Zipf-like term frequencies: common terms get the epsilon idf floor
+    weights = 1 / np.arange(1, len(terms) + 1)
+    docs = [list(rng.choice(terms, size=rng.integers(1, 30), p=weights / weights.sum()))
+            for _ in range(500)]
+    index = BM25Index.from_tokenized(docs)
+    okapi = rank_bm25.BM25Okapi(docs)
+
+    for _ in range(100):
+        query = list(rng.choice(terms, size=rng.integers(1, 5)))
+        expected = okapi.get_scores(query)
+        for prune in (False, True):
+            hits, scores = index.search(query, 10, prune=prune)
+            np.testing.assert_allclose(scores, expected[hits])
+            # Nothing outside the hits scores higher than the k-th hit
+            rest = np.delete(expected, hits)
+            assert len(hits) == 10 and rest.max() <= scores[-1] + 1e-9
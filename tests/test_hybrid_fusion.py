@@ -0,0 +1,31 @@
+import pytest
+from hybrid.retrieval import fuse
+
+
+def hit(method, id, filename, chunk_id, score):
+    return {"method": method, "id": id, "score": score, "doc": f"{method}-{id}",
+            "meta": {"doc_id": id, "chunk_id": chunk_id, "filename": filename}}
+
+
+@pytest.mark.parametrize("fusion", ["rrf", "score"])
+def test_passage_found_by_both_backends_ranks_first(fusion):
+    # Same passage (a.pdf, chunk 7) under different ids / doc ids per backend,
+    # second in both lists; every other hit is a distinct passage
+    dense = [hit("dense", 1, "b.pdf", 0, 0.9), hit("dense", 3, "a.pdf", 7, 0.8),
+             hit("dense", 2, "c.pdf", 3, 0.7), hit("dense", 4, "c.pdf", 4, 0.6)]
+    bm25 = [hit("bm25", 40, "d.pdf", 1, 12.0), hit("bm25", 42, "a.pdf", 7, 11.0),
+            hit("bm25", 41, "e.pdf", 2, 10.0), hit("bm25", 43, "e.pdf", 3, 9.0)]
+
+    fused = fuse([dense, bm25], k=5, fusion=fusion)
+
+    assert (fused[0]["meta"]["filename"], fused[0]["meta"]["chunk_id"]) == ("a.pdf", 7)
+    assert fused[0]["methods"] == ["dense", "bm25"]
+    assert fused[0]["method"] == "dense"  # fields of the first backend that found it
+    assert len(fused) == 5
+    assert sum(h["meta"]["filename"] == "a.pdf" for h in fused) == 1  # merged, not listed twice
+
+
+def test_hits_without_source_are_not_merged():
+    dense = [{"method": "dense", "id": 1, "score": 1.0, "doc": "x", "meta": {}}]
+    bm25 = [{"method": "bm25", "id": 1, "score": 1.0, "doc": "y", "meta": {}}]
+    assert len(fuse([dense, bm25], k=5)) == 2
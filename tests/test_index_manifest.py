@@ -0,0 +1,71 @@
+import json
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("faiss")
+import index_manifest
+from dense import embedding
+import dense.dense_corpus_loader.build_index as build_index
+import dense.dense_corpus_loader.update_index as update_index
+
+
+class FakeModel:
+    def encode(self, texts, batch_size=64):
+        rng = np.random.default_rng(0)
+        return rng.random((len(texts), 8)).astype("float32") - 0.5
+
+
+def fake_chunks(stream, max_tokens, overlap, first_doc_id=0, **kwargs):
+    for doc_id, (doc, meta) in enumerate(stream, start=first_doc_id):
+        yield doc, {"doc_id": doc_id, "chunk_id": 0}
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("index")
+    os.makedirs("data/pdfs")
+    for i in range(2):
+        with open(f"data/pdfs/doc{i}.pdf", "w") as f:
+            f.write(f"document {i}")
+
+    # Like the real downloader: fetches a PDF and (re)writes metadata.json
+    def download():
+        with open("data/pdfs/downloaded.pdf", "w") as f:
+            f.write("downloaded document")
+        with open(index_manifest.METADATA_FILE, "w") as f:
+            json.dump([{"filename": "downloaded.pdf", "title": "Downloaded"}], f)
+
+    def read_pdfs():
+        for path in index_manifest.source_files()[:-1]:
+            with open(path) as f:
+                yield f.read(), {"filepath": path, "filename": os.path.basename(path)}
+
+    monkeypatch.setattr(embedding._model, "instance", FakeModel())
+    monkeypatch.setattr(index_manifest, "download_selected_pdfs", download)
+    monkeypatch.setattr(build_index, "iter_all_data", read_pdfs)
+    monkeypatch.setattr(build_index, "iter_chunks", fake_chunks)
+    build_index.build(force=True)
+
+
+def test_check_after_build_skips(corpus):
+    plan = index_manifest.check(build_index.INDEX_DIR, build_index.MANIFEST, build_index.manifest_config(),
+                                index_exists=True)
+    assert plan.action == "skip"
+
+
+def test_touched_files_are_not_hashed_again(corpus, monkeypatch):
+    st = os.stat("data/pdfs/doc0.pdf")
+    os.utime("data/pdfs/doc0.pdf", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    plan = update_index.ensure_fresh()
+    assert plan.action == "skip"
+    assert plan.refreshed == ["data/pdfs/doc0.pdf"]
+
+    hashed = []
+    file_hash = index_manifest.file_hash
+    monkeypatch.setattr(index_manifest, "file_hash", lambda path: hashed.append(path) or file_hash(path))
+    plan = update_index.ensure_fresh()
+    assert plan.action == "skip"
+    assert hashed == []
@@ -0,0 +1,52 @@
+import threading
+import time
+import pytest
+from dense.dense_corpus_loader.pipeline import prefetch
+
+
+def test_prefetch_stops_and_closes_producer_when_consumer_fails():
+    closed = threading.Event()
+
+    def source():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            closed.set()
+
+    before = threading.active_count()
+    stream = prefetch(source(), maxsize=2)
+    with pytest.raises(RuntimeError):
+        try:
+            for item in stream:
+                if item == 3:
+                    raise RuntimeError("encode failed")
+        finally:
+            stream.close()
+    assert closed.is_set()
+    assert threading.active_count() == before
+
+
+def test_prefetch_reraises_producer_errors():
+    def source():
+        yield 1
+        raise ValueError("bad pdf")
+
+    with pytest.raises(ValueError):
+        list(prefetch(source()))
+
+
+def test_nested_prefetch_close_joins_both_threads():
+    before = threading.active_count()
+
+    def slow():
+        for i in range(100):
+            time.sleep(0.001)
+            yield i
+
+    inner = prefetch(slow(), maxsize=1)
+    outer = prefetch((x * 2 for x in inner), maxsize=1)
+    assert next(outer) == 0
+    outer.close()
+    inner.close()
+    assert threading.active_count() == before
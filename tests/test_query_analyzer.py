@@ -0,0 +1,36 @@
+import pytest
+from sparse.query_analyzer import QueryAnalyzer
+from sparse.text_normalize import normalize
+
+TEXTS = [
+    "Low-earth orbit",
+    "The Moon's far side",
+    "The Moon’s “dark” side — not dark at all",
+    "Apollo&#39;s crew &amp; the rover",
+    "co­operation in ﬁeld tests",
+]
+
+
+def test_query_tokens_match_normalized_document_words():
+    words = [word for text in TEXTS for word in normalize(text).split()]
+    analyzer = QueryAnalyzer({word: word for word in words}, stop_words=[])
+    for text in TEXTS:
+        assert analyzer.analyze(text).split() == [w for w in normalize(text).split() if w.isalpha()]
+    assert analyzer.analyze("low-earth") == "lowearth"
+    assert analyzer.analyze("moon’s") == "moons"
+
+
+def test_query_tokens_match_indexed_lemmas():
+    pytest.importorskip("spacy")
+    preprocess_sparse = pytest.importorskip("sparse.sparse_corpus_loader.preprocess_sparse")
+    try:
+        preprocess_sparse.get_nlp()
+    except OSError:
+        pytest.skip(f"spaCy model {preprocess_sparse.SPACY_MODEL} is not installed")
+
+    from collections import Counter
+    lemma_counts = Counter()
+    indexed = preprocess_sparse.clean_many(TEXTS, n_process=1, verbose=False, lemma_counts=lemma_counts)
+    analyzer = QueryAnalyzer.from_counts(lemma_counts, preprocess_sparse.stop_words())
+    for text, terms in zip(TEXTS, indexed):
+        assert analyzer.analyze(text).split() == terms.split()